@@ -0,0 +1,72 @@
+"""Precomputed truth table of the ``alu`` module for exhaustive verification.
+
+All 7 ops over two 8-bit inputs are only 458752 cases, so the expected
+``(out, c)`` for every ``(op, in1, in2)`` is generated at once as NumPy
+arrays of shape (7, 256, 256) and cached on disk, together with the
+``$readmemh`` image alu_tb.v loads. The cache is rebuilt whenever this
+file changes.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from cpu_model import ALU_ADD, ALU_AND, ALU_INC, ALU_NOT, ALU_ORA, ALU_SUB, ALU_XOR
+
+OPS = 7
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sim_build", "alu")
+TABLE_FILE = os.path.join(CACHE_DIR, "alu_table.npz")
+HEX_FILE = os.path.join(CACHE_DIR, "alu_table.hex")
+
+
+def _version():
+    with open(__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def build_table():
+    """Return ``(out, c)`` uint8 arrays indexed ``[op, in1, in2]``."""
+    in1 = np.arange(256, dtype=np.uint16)[:, None]
+    in2 = np.arange(256, dtype=np.uint16)[None, :]
+    shape = (OPS, 256, 256)
+    out = np.zeros(shape, dtype=np.uint16)
+    c = np.zeros(shape, dtype=np.uint16)
+
+    out[ALU_NOT] = ~in1 & 0xFF
+    out[ALU_AND] = in1 & in2
+    out[ALU_ORA] = in1 | in2
+    out[ALU_ADD] = in1 + in2
+    c[ALU_ADD] = (in1 + in2) >> 8
+    out[ALU_SUB] = in1 - in2
+    c[ALU_SUB] = in1 < in2
+    out[ALU_XOR] = in1 ^ in2
+    out[ALU_INC] = in1 + 1
+    c[ALU_INC] = in1 == 0xFF
+    return (out & 0xFF).astype(np.uint8), c.astype(np.uint8)
+
+
+def load_table():
+    """Cached ``(out, c)``; builds and saves the table (and its hex image) on a miss."""
+    version = _version()
+    if os.path.exists(TABLE_FILE) and os.path.exists(HEX_FILE):
+        with np.load(TABLE_FILE) as cached:
+            if str(cached["version"]) == version:
+                return cached["out"], cached["c"]
+
+    out, c = build_table()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    np.savez(TABLE_FILE, out=out, c=c, version=version)
+    write_memh(HEX_FILE, out, c)
+    return out, c
+
+
+def write_memh(path, out, c):
+    """Write the table as 9-bit ``{c, out}`` words, indexed by ``{op, in1, in2}``."""
+    words = (c.astype(np.uint16) << 8 | out).ravel()
+    np.savetxt(path, words, fmt="%03x")
+
+
+def split_index(index):
+    """Inverse of the ``{op, in1, in2}`` word index used by alu_tb.v."""
+    return index >> 16, (index >> 8) & 0xFF, index & 0xFF
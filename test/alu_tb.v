@@ -0,0 +1,61 @@
+`default_nettype none `timescale 1ns / 1ps
+
+/* Exhaustive testbench for the alu module alone (make TESTBENCH=alu).
+   alu_exhaustive.py loads the expected {c, out} table and starts one batch
+   per op; the sweep over all in1/in2 pairs runs in native simulator time.
+*/
+module alu_tb ();
+
+  reg [2:0] op;
+  reg [7:0] in1;
+  reg [7:0] in2;
+  wire [7:0] out;
+  wire c;
+
+  alu ALU1 (
+      .in1(in1),
+      .in2(in2),
+      .op (op),
+      .out(out),
+      .c  (c)
+  );
+
+  localparam CASES = 7 * 65536;
+
+  reg [8:0] expected [0:CASES-1];
+  reg [8*256-1:0] table_file;
+  reg load = 1'b0;        // rising edge loads the table
+  reg start = 1'b0;       // rising edge sweeps all in1/in2 for batch_op
+  reg done = 1'b0;
+  reg [2:0] batch_op = 0;
+  integer checked = 0;
+  integer errors = 0;
+  reg [18:0] first_error = 0;   // {op, in1, in2} of the first mismatch
+  reg [8:0] first_actual = 0;   // {c, out} seen there
+
+  initial begin
+    if (!$value$plusargs("alu_table=%s", table_file)) table_file = "alu_table.hex";
+  end
+
+  always @(posedge load) $readmemh(table_file, expected);
+
+  always @(posedge start) begin : sweep
+    integer i;
+    done = 1'b0;
+    errors = 0;
+    for (i = 0; i < 65536; i = i + 1) begin
+      {op, in1, in2} = {batch_op, i[15:0]};
+      #1;
+      if ({c, out} !== expected[{batch_op, i[15:0]}]) begin
+        if (errors == 0) begin
+          first_error = {batch_op, i[15:0]};
+          first_actual = {c, out};
+        end
+        errors = errors + 1;
+      end
+    end
+    checked = i;
+    done = 1'b1;
+  end
+
+endmodule
@@ -0,0 +1,179 @@
+"""Assembler, disassembler and binary program format for the ISA in docs/info.md.
+
+Operands are written in encoding order, ``MNEMONIC r1, r2, r3``, where r1
+is ``ui_in[3:0]`` and r2/r3 are the high/low nibbles of ``uio_in``. Which
+field is the destination depends on the opcode, exactly as in the RTL::
+
+    MVR r1, r2          reg[r2] = reg[r1]
+    LDB r1, imm         reg[r1] = imm
+    STB r1              uo_out  = reg[r1]
+    RDS                 uo_out  = processor_stat
+    NOT r1, r2          reg[r2] = ~reg[r1]
+    ORA r1, r2, r3      reg[r3] = reg[r1] | reg[r2]
+    AND/ADD/SUB/XOR r1, r2, r3
+                        reg[r1] = reg[r2] op reg[r3]
+    INC r1, r2          reg[r1] = reg[r2] + 1
+    NOP [opcode]        opcode 0100 unless one of the other NOP slots is given
+    .byte ui, uio       raw encoding
+
+Comments start with ``;``, ``#`` or ``//``. A program is stored as packed
+bytes, two per clock cycle (``ui_in``, ``uio_in``), so tests load it with
+one bulk read.
+
+Usage: ``python assembler.py prog.s -o prog.bin`` or ``python assembler.py -d prog.bin``.
+"""
+
+import argparse
+import re
+import sys
+
+from cpu_model import LDB, MNEMONICS, NOPS, RDS, STB
+
+_OPCODES = {name: inst for inst, name in MNEMONICS.items()}
+
+# Number of register operands per mnemonic, in encoding order.
+_REG_OPERANDS = {"MVR": 2, "STB": 1, "RDS": 0, "NOT": 2, "INC": 2,
+                 "AND": 3, "ORA": 3, "ADD": 3, "SUB": 3, "XOR": 3}
+
+_COMMENT = re.compile(r"(;|#|//).*")
+
+
+class AssemblerError(ValueError):
+    pass
+
+
+def _register(token, lineno):
+    match = re.fullmatch(r"[rR](\d+)", token)
+    if not match or int(match.group(1)) > 15:
+        raise AssemblerError(f"line {lineno}: bad register {token!r}")
+    return int(match.group(1))
+
+
+def _immediate(token, lineno):
+    try:
+        value = int(token, 0)
+    except ValueError:
+        raise AssemblerError(f"line {lineno}: bad immediate {token!r}") from None
+    if not 0 <= value <= 0xFF:
+        raise AssemblerError(f"line {lineno}: immediate {token} out of range")
+    return value
+
+
+def assemble_line(line, lineno=1):
+    """Encode one source line; returns ``(ui_in, uio_in)`` or ``None`` for blank lines."""
+    line = _COMMENT.sub("", line).strip()
+    if not line:
+        return None
+    parts = line.split(None, 1)
+    mnemonic = parts[0].upper()
+    rest = parts[1] if len(parts) > 1 else ""
+    operands = [op.strip() for op in rest.split(",")] if rest.strip() else []
+
+    if mnemonic == ".BYTE":
+        if len(operands) != 2:
+            raise AssemblerError(f"line {lineno}: .byte takes two values")
+        return _immediate(operands[0], lineno), _immediate(operands[1], lineno)
+    if mnemonic == "NOP":
+        inst = _immediate(operands[0], lineno) if operands else NOPS[0]
+        if len(operands) > 1 or inst not in NOPS:
+            raise AssemblerError(f"line {lineno}: bad NOP operands {rest!r}")
+        return inst << 4, 0
+    if mnemonic == "LDB":
+        if len(operands) != 2:
+            raise AssemblerError(f"line {lineno}: LDB takes a register and an immediate")
+        return LDB << 4 | _register(operands[0], lineno), _immediate(operands[1], lineno)
+    if mnemonic not in _REG_OPERANDS:
+        raise AssemblerError(f"line {lineno}: unknown mnemonic {mnemonic!r}")
+    if len(operands) != _REG_OPERANDS[mnemonic]:
+        raise AssemblerError(
+            f"line {lineno}: {mnemonic} takes {_REG_OPERANDS[mnemonic]} register operands")
+
+    r1, r2, r3 = [_register(op, lineno) for op in operands] + [0] * (3 - len(operands))
+    return _OPCODES[mnemonic] << 4 | r1, r2 << 4 | r3
+
+
+def assemble(source):
+    """Assemble source text into the packed binary program format."""
+    program = bytearray()
+    for lineno, line in enumerate(source.splitlines(), 1):
+        encoded = assemble_line(line, lineno)
+        if encoded is not None:
+            program += bytes(encoded)
+    return bytes(program)
+
+
+def disassemble(ui_in, uio_in):
+    """Render one encoded instruction; fields the opcode ignores are dropped."""
+    inst, r1 = ui_in >> 4, ui_in & 0xF
+    r2, r3 = uio_in >> 4, uio_in & 0xF
+    if inst in NOPS:
+        return "NOP" if inst == NOPS[0] else f"NOP 0b{inst:04b}"
+    mnemonic = MNEMONICS[inst]
+    if inst == LDB:
+        return f"LDB r{r1}, 0x{uio_in:02X}"
+    if inst == RDS:
+        return "RDS"
+    if inst == STB:
+        return f"STB r{r1}"
+    regs = (r1, r2, r3)[:_REG_OPERANDS[mnemonic]]
+    return f"{mnemonic} " + ", ".join(f"r{reg}" for reg in regs)
+
+
+def pairs(program):
+    """Iterate a packed program as ``(ui_in, uio_in)`` pairs."""
+    return zip(program[0::2], program[1::2])
+
+
+def encode(instructions):
+    """Pack an iterable of ``(ui_in, uio_in)`` pairs into the binary format."""
+    program = bytearray()
+    for ui_in, uio_in in instructions:
+        program += bytes((ui_in, uio_in))
+    return bytes(program)
+
+
+def listing(instructions, start=0):
+    """Human-readable listing with cycle numbers and raw bytes, for failure reports."""
+    return "\n".join(
+        f"{cycle:8d}: {ui_in:02X} {uio_in:02X}  {disassemble(ui_in, uio_in)}"
+        for cycle, (ui_in, uio_in) in enumerate(instructions, start)
+    )
+
+
+def save_program(path, program):
+    with open(path, "wb") as f:
+        f.write(program if isinstance(program, (bytes, bytearray)) else encode(program))
+
+
+def load_program(path):
+    """Read a packed program with a single bulk read."""
+    with open(path, "rb") as f:
+        program = f.read()
+    if len(program) % 2:
+        raise AssemblerError(f"{path}: truncated program (odd length)")
+    return program
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="assembly source, or a binary program with -d")
+    parser.add_argument("-o", "--output", help="binary program to write (default: stdout listing)")
+    parser.add_argument("-d", "--disassemble", action="store_true", help="disassemble a binary program")
+    args = parser.parse_args(argv)
+
+    if args.disassemble:
+        print(listing(pairs(load_program(args.input))))
+        return
+    with open(args.input) as f:
+        program = assemble(f.read())
+    if args.output:
+        save_program(args.output, program)
+    else:
+        print(listing(pairs(program)))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssemblerError as e:
+        sys.exit(f"error: {e}")
@@ -0,0 +1,169 @@
+"""Vectorized reference model running N independent tt_um_8bit_cpu instances.
+
+``BatchCPU`` holds the register files of all instances as an ``(N, 14)``
+uint8 array and applies each instruction as masked NumPy updates, so one
+Python process can precompute golden ``uo_out`` and carry traces for
+millions of random ``(ui_in, uio_in)`` streams before a cocotb run starts.
+
+It follows cpu_model.CPUModel exactly, including X tracking: every value
+carries a ``known`` flag that is cleared for reads of registers 14/15 and
+whatever is computed from them.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from cpu_model import (
+    ALU_ADD, ALU_AND, ALU_INC, ALU_NOT, ALU_ORA, ALU_SUB, ALU_XOR, LDB,
+    MNEMONICS, MVR, OPERANDS, RDS, REG_COUNT, STB,
+)
+from stimulus import DEFAULT_WEIGHTS
+
+# Trace arrays are (steps, N): uo_out/carry after each step, and whether they are known (not X).
+BatchTrace = namedtuple("BatchTrace", "uo_out uo_known carry carry_known")
+
+
+def _field_table(slot):
+    """Per-opcode lookup of the operand field used in ``slot`` of OPERANDS (0 if unused)."""
+    table = np.zeros(16, dtype=np.intp)
+    for inst, fields in OPERANDS.items():
+        if fields[slot] is not None:
+            table[inst] = fields[slot]
+    return table
+
+
+_RD1 = _field_table(0)
+_RD2 = _field_table(1)
+_WR = _field_table(2)
+_WRITES = np.array([inst in OPERANDS and OPERANDS[inst][2] is not None for inst in range(16)])
+_IS_ALU = np.array([inst in MNEMONICS and inst >= 0b1000 for inst in range(16)])
+
+
+class BatchCPU:
+    """N copies of the CPU state, stepped together one instruction per call."""
+
+    def __init__(self, n):
+        self.n = n
+        self._rows = np.arange(n)
+        # Two spare columns stand in for the out-of-range registers 14 and 15;
+        # they are never marked known, so reads from them come back as X.
+        self._regs = np.zeros((n, 16), dtype=np.uint8)
+        self._known = np.zeros((n, 16), dtype=bool)
+        self.reset()
+
+    @property
+    def regs(self):
+        return self._regs[:, :REG_COUNT]
+
+    @property
+    def regs_known(self):
+        return self._known[:, :REG_COUNT]
+
+    def reset(self):
+        """Reset every instance, like CPUModel.reset()."""
+        self._regs[:] = 0
+        self._known[:, :REG_COUNT] = True
+        self._known[:, REG_COUNT:] = False
+        self.processor_stat = np.zeros(self.n, dtype=np.uint8)
+        self.stat_known = np.ones(self.n, dtype=bool)
+        self.data_out = np.zeros(self.n, dtype=np.uint8)
+        self.out_known = np.ones(self.n, dtype=bool)
+
+    def step(self, ui_in, uio_in):
+        """Execute one instruction per instance; ``ui_in``/``uio_in`` have shape (N,).
+
+        Returns ``(uo_out, known)`` after the clock edge.
+        """
+        ui_in = np.asarray(ui_in, dtype=np.uint8)
+        uio_in = np.asarray(uio_in, dtype=np.uint8)
+        rows = self._rows
+        inst = ui_in >> 4
+        fields = np.stack((ui_in & 0xF, uio_in >> 4, uio_in & 0xF))
+
+        rd1 = fields[_RD1[inst], rows]
+        rd2 = fields[_RD2[inst], rows]
+        in1, in1_known = self._regs[rows, rd1], self._known[rows, rd1]
+        in2, in2_known = self._regs[rows, rd2], self._known[rows, rd2]
+
+        op = inst & 0b111
+        is_alu = _IS_ALU[inst]
+        wide = in1.astype(np.uint16)
+        both_known = in1_known & in2_known
+
+        # ALU result, one masked select per operation
+        masks = [is_alu & (op == alu_op) for alu_op in
+                 (ALU_NOT, ALU_AND, ALU_ORA, ALU_ADD, ALU_SUB, ALU_XOR, ALU_INC)]
+        not_m, and_m, ora_m, add_m, sub_m, xor_m, inc_m = masks
+        alu_out = np.select(masks, [
+            ~in1, in1 & in2, in1 | in2, in1 + in2, in1 - in2, in1 ^ in2, in1 + 1,
+        ], 0).astype(np.uint8)
+        alu_c = np.select([add_m, sub_m, inc_m], [
+            (wide + in2) >> 8, in1 < in2, in1 == 0xFF,
+        ], 0).astype(np.uint8)
+        alu_known = np.select([not_m | inc_m, and_m | ora_m | sub_m | add_m | xor_m],
+                              [in1_known, both_known], True)
+        c_known = np.select([add_m | sub_m, inc_m], [both_known, in1_known], True)
+
+        # Register write-back
+        inst_ldb = inst == LDB
+        inst_mvr = inst == MVR
+        w_data = np.where(inst_ldb, uio_in, np.where(inst_mvr, in1, alu_out))
+        w_known = np.where(inst_ldb, True, np.where(inst_mvr, in1_known, alu_known))
+        write = _WRITES[inst]
+        w_rows = rows[write]
+        w_reg = fields[_WR[inst], rows][write]
+        self._regs[w_rows, w_reg] = w_data[write]
+        self._known[w_rows, w_reg] = w_known[write]
+        self._known[:, REG_COUNT:] = False
+
+        # data_out mux, using processor_stat from before the edge
+        stb = inst == STB
+        rds = inst == RDS
+        self.data_out = np.where(stb, in1, np.where(rds, self.processor_stat, self.data_out))
+        self.out_known = np.where(stb, in1_known, np.where(rds, self.stat_known, self.out_known))
+
+        self.processor_stat = np.where(is_alu, alu_c, self.processor_stat)
+        self.stat_known = np.where(is_alu, c_known, self.stat_known)
+        return self.data_out, self.out_known
+
+    def run(self, ui_in, uio_in):
+        """Run (steps, N) input arrays and return a BatchTrace of the same shape."""
+        ui_in = np.asarray(ui_in, dtype=np.uint8)
+        uio_in = np.asarray(uio_in, dtype=np.uint8)
+        trace = BatchTrace(*(np.empty(ui_in.shape, dtype=dtype)
+                             for dtype in (np.uint8, bool, np.uint8, bool)))
+        for t in range(ui_in.shape[0]):
+            trace.uo_out[t], trace.uo_known[t] = self.step(ui_in[t], uio_in[t])
+            trace.carry[t] = self.processor_stat
+            trace.carry_known[t] = self.stat_known
+        return trace
+
+
+def random_inputs(seed, steps, n):
+    """Uniform random (steps, N) ``ui_in``/``uio_in`` arrays for batch runs."""
+    rng = np.random.default_rng(seed)
+    pins = rng.integers(0, 256, size=(2, steps, n), dtype=np.uint8)
+    return pins[0], pins[1]
+
+
+def weighted_inputs(seed, steps, n, weights=None, out_of_range=0.05):
+    """(steps, N) ``ui_in``/``uio_in`` arrays drawn like stimulus.instruction_stream.
+
+    Same opcode weights and rate of out-of-range register fields, drawn with
+    NumPy, so the streams differ from instruction_stream for the same seed.
+    ``seed`` may also be a ``np.random.Generator``, to draw a long run in blocks.
+    """
+    rng = np.random.default_rng(seed)
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    p = np.array([weights.get(inst, 0) for inst in range(16)], dtype=float)
+    inst = rng.choice(16, size=(steps, n), p=p / p.sum()).astype(np.uint8)
+    shape = (3, steps, n)
+    regs = np.where(rng.random(shape) < 1.0 - out_of_range,
+                    rng.integers(0, REG_COUNT, shape, dtype=np.uint8),
+                    rng.integers(REG_COUNT, 16, shape, dtype=np.uint8))
+    data = rng.integers(0, 256, (steps, n), dtype=np.uint8)
+    ui_in = inst << 4 | regs[0]
+    # uio_in carries the data byte for LDB; unused fields are random, as in instruction_stream
+    uio_in = np.where(inst == LDB, data, regs[1] << 4 | regs[2])
+    return ui_in, uio_in
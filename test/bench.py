@@ -0,0 +1,116 @@
+"""Simulation throughput benchmarks for the cocotb harness.
+
+Run with ``make -B MODULE=bench``. Every workload runs a fixed-seed
+instruction stream in each checking mode; wall time, simulated cycles per
+second and the per-cycle cost of the Python side (stimulus, model and
+checks, timed on their own) are written to bench_results.json
+(``BENCH_OUT``) so harness speed can be compared across commits.
+``BENCH_CYCLES`` and ``BENCH_SEED`` set the run length and seed.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+
+import cocotb
+from cocotb.regression import TestFactory
+
+import waves
+from cpu_model import CPUModel
+from harness import check_output, reset_dut, run_lockstep, run_preloaded
+from probe import Probe
+from stimulus import instruction_stream, parse_weights
+
+WORKLOADS = {
+    "alu": "NOT=2,AND=4,ORA=4,ADD=4,SUB=4,XOR=4,INC=4,LDB=2",
+    "move": "MVR=8,LDB=8",
+    "output": "STB=8,RDS=4,LDB=4",
+    "mixed": "",
+}
+
+# ports: uo_out only; internal: also RF1.reg_data/processor_stat every cycle;
+# preloaded: ports only, played back from the testbench stimulus memory
+MODES = ("ports", "internal", "preloaded")
+
+CYCLES = int(os.getenv("BENCH_CYCLES", "20000"))
+SEED = int(os.getenv("BENCH_SEED", "12345"))
+OUTPUT = os.getenv("BENCH_OUT", "bench_results.json")
+
+results = []
+_python_times = {}
+
+
+def _weights(workload):
+    spec = WORKLOADS[workload]
+    return parse_weights(spec, base={}) if spec else parse_weights("")
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def python_time(workload):
+    """Seconds the harness spends in Python alone for ``workload``: stimulus, model and checks."""
+    if workload in _python_times:
+        return _python_times[workload]
+    model = CPUModel()
+    start = time.perf_counter()
+    for ui, uio in instruction_stream(SEED, _weights(workload), CYCLES):
+        expected = model.step(ui, uio)
+        if expected is not None:
+            check_output(expected, expected, 0)
+    _python_times[workload] = time.perf_counter() - start
+    return _python_times[workload]
+
+
+def write_results():
+    report = {
+        "revision": _git_revision(),
+        "simulator": f"{cocotb.SIM_NAME} {cocotb.SIM_VERSION}",
+        "python": platform.python_version(),
+        "seed": SEED,
+        "cycles": CYCLES,
+        "results": results,
+    }
+    with open(OUTPUT, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+async def run_benchmark(dut, workload, mode):
+    with waves.configure(dut, "off"):
+        await reset_dut(dut)
+        program = instruction_stream(SEED, _weights(workload), CYCLES)
+
+        start = time.perf_counter()
+        if mode == "preloaded":
+            cycles = await run_preloaded(dut, program)
+        else:
+            probe = Probe(dut, mode="full" if mode == "internal" else "ports")
+            cycles = await run_lockstep(dut, program, probe=probe)
+        wall = time.perf_counter() - start
+
+    python = python_time(workload)
+    results.append({
+        "workload": workload,
+        "mode": mode,
+        "cycles": cycles,
+        "wall_time": wall,
+        "cycles_per_second": cycles / wall,
+        "python_us_per_cycle": 1e6 * python / cycles,
+        "simulator_us_per_cycle": 1e6 * max(wall - python, 0.0) / cycles,
+    })
+    write_results()
+    cocotb.log.info(f"{workload}/{mode}: {cycles / wall:.0f} cycles/s, "
+                    f"{1e6 * python / cycles:.1f} us/cycle in Python")
+
+
+factory = TestFactory(run_benchmark)
+factory.add_option("workload", list(WORKLOADS))
+factory.add_option("mode", MODES)
+factory.generate_tests()
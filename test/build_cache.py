@@ -0,0 +1,113 @@
+"""Compile-once simulation build cache.
+
+The compiled Icarus image (``sim.vvp``) only depends on the Verilog
+sources, the compile arguments (including the ``GL_TEST``/``FUNCTIONAL``/
+``UNIT_DELAY`` defines of a ``GATES=yes`` build), the top level, the
+timescale and the compiler version. ``build_cache`` hashes exactly those,
+as reported by ``make build-config``, and keeps one ``SIM_BUILD``
+directory per hash under ``sim_build/cache``. Runs and regression shards
+that point ``SIM_BUILD`` at it load the existing image instead of
+recompiling.
+
+Usage::
+
+    make SIM_BUILD=$(python build_cache.py --print-dir)
+    make SIM_BUILD=$(python build_cache.py --print-dir GATES=yes) GATES=yes
+"""
+
+import argparse
+import fcntl
+import hashlib
+import os
+import shlex
+import subprocess
+import sys
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(TEST_DIR, "sim_build", "cache")
+
+
+def build_config(make_vars=()):
+    """Return the compile inputs the Makefile would use, as a dict of strings."""
+    output = subprocess.check_output(
+        ["make", "-s", "-f", os.path.join(TEST_DIR, "Makefile"), f"PWD={TEST_DIR}",
+         "build-config", *make_vars],
+        cwd=TEST_DIR, text=True)
+    config = {}
+    for line in output.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            config[key] = value.strip()
+    return config
+
+
+def _compiler_version():
+    try:
+        result = subprocess.run(["iverilog", "-V"], capture_output=True, text=True)
+    except OSError:
+        return "unknown"
+    lines = (result.stdout or result.stderr).splitlines()
+    return lines[0] if lines else "unknown"
+
+
+def cache_key(config):
+    """Hash of everything that goes into sim.vvp."""
+    digest = hashlib.sha256()
+    for path in shlex.split(config.get("VERILOG_SOURCES", "")):
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    # Icarus' Makefile adds "-f $(SIM_BUILD)/cmds.f", which names the build
+    # directory itself; its content is the timescale, hashed separately.
+    args = []
+    tokens = iter(shlex.split(config.get("COMPILE_ARGS", "")))
+    for arg in tokens:
+        if arg == "-f":
+            next(tokens, None)
+        else:
+            args.append(arg)
+    for name in ("EXTRA_ARGS", "TOPLEVEL", "TIMESCALE"):
+        args.append(f"{name}={config.get(name, '')}")
+    args.append(_compiler_version())
+    digest.update("\0".join(args).encode())
+    return digest.hexdigest()[:16]
+
+
+def ensure_built(make_vars=(), log=sys.stderr):
+    """Make sure the image for ``make_vars`` is compiled; returns its SIM_BUILD directory.
+
+    Prints whether the cache was hit. Safe to call from several processes.
+    """
+    key = cache_key(build_config(make_vars))
+    sim_build = os.path.join(CACHE_DIR, key)
+    image = os.path.join(sim_build, "sim.vvp")
+    os.makedirs(sim_build, exist_ok=True)
+
+    with open(os.path.join(sim_build, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(image):
+            # Same content but possibly newer source timestamps (checkouts,
+            # rebases): refresh the image so make does not rebuild it.
+            os.utime(image)
+            print(f"build cache hit: {key}", file=log)
+        else:
+            print(f"build cache miss: {key}, compiling", file=log)
+            subprocess.check_call(
+                ["make", "-f", os.path.join(TEST_DIR, "Makefile"), f"PWD={TEST_DIR}",
+                 f"SIM_BUILD={sim_build}", image, *make_vars],
+                cwd=TEST_DIR, stdout=log, stderr=log)
+    return sim_build
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile-once simulation build cache")
+    parser.add_argument("make_vars", nargs="*", help="make variables, e.g. GATES=yes")
+    parser.add_argument("--print-dir", action="store_true", help="print the SIM_BUILD directory to use")
+    args = parser.parse_args(argv)
+
+    sim_build = ensure_built(args.make_vars)
+    if args.print_dir:
+        print(sim_build)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Cycle-accurate Python reference model of tt_um_8bit_cpu.
+
+The model mirrors src/tt06-8bit-cpu.v one instruction per clock: ``step``
+applies the same operand-field decoding as the ``always @(*)`` case in the
+top module, the ``alu`` carry rules and the ``processor_stat``/``data_out``
+update, and returns the value ``uo_out`` holds after the rising edge.
+
+It never touches the simulator, so the cocotb side only has to drive pins
+and compare ``uo_out`` once per cycle.
+
+``reg_data`` only has ``REG_COUNT`` (14) entries. Reads of registers 14 and
+15 return X in the RTL and writes to them are dropped; the model tracks X
+as ``None`` and propagates it, so checks treat those values as don't-care.
+"""
+
+# ALU OPs --------------------------------------------------------------
+ALU_NOT = 0b000
+ALU_AND = 0b001
+ALU_ORA = 0b010
+ALU_ADD = 0b011
+ALU_SUB = 0b100
+ALU_XOR = 0b101
+ALU_INC = 0b110
+
+# ISA --------------------------------------------------------------
+#-- R level
+MVR = 0b0000            # Move Register
+LDB = 0b0001            # Load Byte into Register
+STB = 0b0010            # Store Byte from Register
+RDS = 0b0011            # Read (store) processor status
+
+#-- Arithmatics
+NOT = 0b1000 | ALU_NOT
+AND = 0b1000 | ALU_AND
+ORA = 0b1000 | ALU_ORA
+ADD = 0b1000 | ALU_ADD
+SUB = 0b1000 | ALU_SUB
+XOR = 0b1000 | ALU_XOR
+INC = 0b1000 | ALU_INC
+
+NOPS = (0b0100, 0b0101, 0b0110, 0b0111, 0b1111)
+
+MNEMONICS = {
+    MVR: "MVR", LDB: "LDB", STB: "STB", RDS: "RDS",
+    NOT: "NOT", AND: "AND", ORA: "ORA", ADD: "ADD",
+    SUB: "SUB", XOR: "XOR", INC: "INC",
+}
+
+REG_COUNT = 14
+
+# Operand fields, as indices into the (r1, r2, r3) tuple returned by decode().
+R1, R2, R3 = 0, 1, 2
+
+# Per opcode: (r_reg1 field, r_reg2 field, w_reg field), None where unused.
+# This is the routing done by the case statement in tt_um_8bit_cpu; note
+# that it is not uniform (ORA writes r3, NOT and MVR write r2).
+OPERANDS = {
+    MVR: (R1, None, R2),
+    LDB: (None, None, R1),
+    STB: (R1, None, None),
+    RDS: (None, None, None),
+    NOT: (R1, None, R2),
+    AND: (R2, R3, R1),
+    ORA: (R1, R2, R3),
+    ADD: (R2, R3, R1),
+    SUB: (R2, R3, R1),
+    XOR: (R2, R3, R1),
+    INC: (R2, None, R1),
+}
+
+
+def decode(ui_in, uio_in):
+    """Split the input pins into ``(inst, (r1, r2, r3))``."""
+    return ui_in >> 4, (ui_in & 0xF, uio_in >> 4, uio_in & 0xF)
+
+
+def alu(op, in1, in2):
+    """Return ``(out, c)`` of the ``alu`` module, with ``None`` for X."""
+    # The logic ops drive a constant carry, so it is known even for X inputs.
+    if op == ALU_NOT:
+        return (None if in1 is None else ~in1 & 0xFF), 0
+    if op in (ALU_AND, ALU_ORA, ALU_XOR):
+        if in1 is None or in2 is None:
+            return None, 0
+        if op == ALU_AND:
+            return in1 & in2, 0
+        if op == ALU_ORA:
+            return in1 | in2, 0
+        return in1 ^ in2, 0
+    if op == ALU_ADD:
+        if in1 is None or in2 is None:
+            return None, None
+        temp = in1 + in2
+        return temp & 0xFF, temp >> 8
+    if op == ALU_SUB:
+        if in1 is None or in2 is None:
+            return None, None
+        return (in1 - in2) & 0xFF, int(in1 < in2)
+    if op == ALU_INC:
+        if in1 is None:
+            return None, None
+        # c = in1[7] & ~out[7], i.e. only 0xFF + 1 carries
+        return (in1 + 1) & 0xFF, int(in1 == 0xFF)
+    return 0, 0
+
+
+class CPUModel:
+    """Architectural state of one tt_um_8bit_cpu, stepped one clock at a time."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Apply ``rst``: clear the register file, ``processor_stat`` and ``data_out``."""
+        self.regs = [0] * REG_COUNT
+        self.processor_stat = 0
+        self.data_out = 0
+
+    def read(self, index):
+        """Return ``reg_data[index]``, or ``None`` outside ``REG_COUNT``."""
+        return self.regs[index] if index < REG_COUNT else None
+
+    def write(self, index, value):
+        # Writes past REG_COUNT fall off the end of reg_data in the RTL.
+        if index < REG_COUNT:
+            self.regs[index] = value
+
+    def step(self, ui_in, uio_in):
+        """Execute one instruction and return ``uo_out`` after the clock edge."""
+        inst, fields = decode(ui_in, uio_in)
+        if inst == LDB:
+            self.write(fields[R1], uio_in)
+        elif inst == STB:
+            self.data_out = self.read(fields[R1])
+        elif inst == RDS:
+            self.data_out = self.processor_stat
+        elif inst == MVR:
+            self.write(fields[R2], self.read(fields[R1]))
+        elif inst in MNEMONICS:
+            rd1, rd2, wr = OPERANDS[inst]
+            in1 = self.read(fields[rd1])
+            in2 = None if rd2 is None else self.read(fields[rd2])
+            out, c = alu(inst & 0b111, in1, in2)
+            self.write(fields[wr], out)
+            self.processor_stat = c
+        return self.data_out
+
+    def run(self, program):
+        """Step through ``program`` and return the list of ``uo_out`` values."""
+        return [self.step(ui_in, uio_in) for ui_in, uio_in in program]
+
+    def copy(self):
+        model = CPUModel.__new__(CPUModel)
+        model.regs = list(self.regs)
+        model.processor_stat = self.processor_stat
+        model.data_out = self.data_out
+        return model
+
+    def restore_program(self):
+        """Instructions that take a freshly reset CPU to this model's state.
+
+        ``processor_stat`` is set by an INC that carries, ``data_out`` by an
+        STB, then every register is loaded with LDB (which touches neither).
+        Unknown (X) values cannot be recreated and are left at their reset value.
+        """
+        program = []
+        if self.processor_stat:
+            program += [(LDB << 4, 0xFF), (INC << 4, 0x00)]    # INC r0, r0 carries
+        if self.data_out:
+            program += [(LDB << 4, self.data_out), (STB << 4, 0x00)]
+        program += [(LDB << 4 | i, value) for i, value in enumerate(self.regs) if value is not None]
+        return program
+
+
+def matches(expected, actual):
+    """True when ``actual`` agrees with ``expected``; X (``None``) matches anything."""
+    return expected is None or expected == actual
@@ -0,0 +1,283 @@
+"""Compact per-cycle traces: one fixed-width record per cycle, stored by column.
+
+A trace is a directory holding one append-only file per column and a
+``meta.json``:
+
+=================  =====  ==============================================
+column             type   contents
+=================  =====  ==============================================
+``ui_in``          u8     instruction driven on the cycle
+``uio_in``         u8
+``uo_out``         u8     ``uo_out`` after the cycle's rising edge
+``processor_stat`` u8     carry after the cycle (0 when unknown)
+``flags``          u8     ``UO_X``, ``STAT_X``: value was X or not read
+``rf_digest``      u32    optional CRC32 of the register file (rf_digest)
+=================  =====  ==============================================
+
+TraceWriter buffers a chunk of cycles in byte arrays and appends it to
+the column files, then rewrites ``meta.json`` with the cycle count, so an
+interrupted run still leaves a readable prefix. ``open_trace`` maps the
+columns with ``np.memmap``: no copy, no parsing, so multi-million-cycle
+traces are compared against the model (``check_model``) or against each
+other (``first_divergence``) in seconds.
+
+Usage::
+
+    python cycle_trace.py info sim_build/trace
+    python cycle_trace.py check sim_build/trace
+    python cycle_trace.py diff sim_build/trace_rtl sim_build/trace_gl
+"""
+
+import argparse
+import json
+import os
+import sys
+import zlib
+from array import array
+
+import numpy as np
+
+from cpu_model import REG_COUNT, CPUModel
+from driver import resolve
+
+COLUMNS = {
+    "ui_in": np.uint8,
+    "uio_in": np.uint8,
+    "uo_out": np.uint8,
+    "processor_stat": np.uint8,
+    "flags": np.uint8,
+    "rf_digest": np.dtype("<u4"),
+}
+UO_X = 1
+STAT_X = 2
+
+FORMAT_VERSION = 1
+
+
+def rf_digest(regs):
+    """CRC32 of register values, X (``None``) folded in as a separate mask."""
+    mask = sum(1 << i for i, value in enumerate(regs) if value is None)
+    data = bytes(0 if value is None else value for value in regs)
+    return zlib.crc32(data + mask.to_bytes(2, "little"))
+
+
+class TraceWriter:
+    """Appends cycle records to the trace directory ``path``.
+
+    With a ``dut``, ``sample`` also reads ``processor_stat`` (and, with
+    ``digest=True``, the register file) from the design; where the internal
+    names do not exist (gate level) those are recorded as unknown.
+    """
+
+    def __init__(self, path, dut=None, digest=False, chunk=65536, meta=None):
+        self.path = path
+        self.digest = digest
+        self.chunk = chunk
+        self.cycles = 0
+        self.meta = dict(meta or {})
+        self._columns = [name for name in COLUMNS if digest or name != "rf_digest"]
+        self._ui, self._uio, self._uo, self._stat_col, self._flags = (bytearray() for _ in range(5))
+        self._digests = array("I")
+
+        os.makedirs(path, exist_ok=True)
+        for name in COLUMNS:
+            column = os.path.join(path, name)
+            if os.path.exists(column):
+                os.remove(column)
+
+        self._stat = self._regs = None
+        if dut is not None and os.getenv("GATES") != "yes":
+            try:
+                self._stat = dut.myCPU.processor_stat
+                if digest:
+                    self._regs = [dut.myCPU.RF1.reg_data[i] for i in range(REG_COUNT)]
+            except (AttributeError, IndexError):
+                self._stat = self._regs = None
+        self._write_meta()
+
+    def sample(self, ui_in, uio_in, uo_out):
+        """Append the cycle just executed, with the internal state read from the design."""
+        stat = digest = None
+        if self._stat is not None:
+            stat = resolve(self._stat.value)
+        if self._regs is not None:
+            digest = rf_digest([resolve(reg.value) for reg in self._regs])
+        self.record(ui_in, uio_in, uo_out, stat, digest)
+
+    def record(self, ui_in, uio_in, uo_out, stat=None, digest=None):
+        """Append one cycle; ``None`` for an X or unread ``uo_out``/``stat``."""
+        self._ui.append(ui_in)
+        self._uio.append(uio_in)
+        self._uo.append(0 if uo_out is None else uo_out)
+        self._stat_col.append(0 if stat is None else stat)
+        self._flags.append((UO_X if uo_out is None else 0) | (STAT_X if stat is None else 0))
+        if self.digest:
+            self._digests.append(0 if digest is None else digest)
+        if len(self._ui) == self.chunk:
+            self.flush()
+
+    def record_many(self, instructions, responses):
+        """Append a block of cycles at once (no internal state, as from run_preloaded)."""
+        for (ui_in, uio_in), uo_out in zip(instructions, responses):
+            self.record(ui_in, uio_in, uo_out)
+
+    def flush(self):
+        count = len(self._ui)
+        if count:
+            buffers = {"ui_in": self._ui, "uio_in": self._uio, "uo_out": self._uo,
+                       "processor_stat": self._stat_col, "flags": self._flags,
+                       "rf_digest": np.asarray(self._digests, dtype=COLUMNS["rf_digest"]).tobytes()}
+            for name in self._columns:
+                with open(os.path.join(self.path, name), "ab") as f:
+                    f.write(buffers[name])
+            for buffer in (self._ui, self._uio, self._uo, self._stat_col, self._flags):
+                del buffer[:]
+            del self._digests[:]
+            self.cycles += count
+        self._write_meta()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_meta(self):
+        meta = {
+            "version": FORMAT_VERSION,
+            "cycles": self.cycles,
+            "columns": {name: np.dtype(COLUMNS[name]).str for name in self._columns},
+            **self.meta,
+        }
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+
+class Trace:
+    """A recorded trace; columns are read-only ``np.memmap`` arrays, e.g. ``trace.uo_out``."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported trace format {self.meta.get('version')}")
+        self.path = path
+        self.cycles = self.meta["cycles"]
+        self.columns = {}
+        for name, dtype in self.meta["columns"].items():
+            dtype = np.dtype(dtype)
+            if self.cycles:
+                self.columns[name] = np.memmap(os.path.join(path, name), dtype=dtype, mode="r",
+                                               shape=(self.cycles,))
+            else:
+                self.columns[name] = np.zeros(0, dtype=dtype)
+
+    def __len__(self):
+        return self.cycles
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def uo_known(self):
+        return (self.flags & UO_X) == 0
+
+    @property
+    def stat_known(self):
+        return (self.flags & STAT_X) == 0
+
+
+def open_trace(path):
+    return Trace(path)
+
+
+def trace_from_env(dut, test, **meta):
+    """TraceWriter into ``<dir>/<test>`` for ``TRACE=<dir>`` (``TRACE_DIGEST=1`` adds register digests), or None.
+
+    Every test records into its own subdirectory, so the tests of one run do
+    not overwrite each other's traces.
+    """
+    path = os.getenv("TRACE")
+    if not path:
+        return None
+    return TraceWriter(os.path.join(path, test), dut, os.getenv("TRACE_DIGEST") == "1",
+                       meta={"test": test, **meta})
+
+
+def model_outputs(ui_in, uio_in):
+    """``(uo_out, known)`` arrays the reference model expects for the given inputs."""
+    model = CPUModel()
+    step = model.step
+    expected = [step(ui, uio) for ui, uio in zip(ui_in.tolist(), uio_in.tolist())]
+    known = np.array([value is not None for value in expected], dtype=bool)
+    values = np.array([0 if value is None else value for value in expected], dtype=np.uint8)
+    return values, known
+
+
+def check_model(trace):
+    """First cycle where ``trace.uo_out`` disagrees with the model, or None."""
+    expected, known = model_outputs(trace.ui_in, trace.uio_in)
+    bad = known & (~trace.uo_known | (trace.uo_out != expected))
+    return int(np.argmax(bad)) if bad.any() else None
+
+
+def first_divergence(a, b, cycles=None):
+    """First cycle where traces ``a`` and ``b`` disagree on the inputs or on a known ``uo_out``.
+
+    Only the first ``cycles`` (default: the shorter trace) are compared.
+    Returns ``(cycle, column)`` or None.
+    """
+    n = min(len(a), len(b)) if cycles is None else cycles
+    for column in ("ui_in", "uio_in"):
+        bad = a.columns[column][:n] != b.columns[column][:n]
+        if bad.any():
+            return int(np.argmax(bad)), column
+    known = a.uo_known[:n] & b.uo_known[:n]
+    bad = known & (a.uo_out[:n] != b.uo_out[:n])
+    if bad.any():
+        return int(np.argmax(bad)), "uo_out"
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and compare cycle traces")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info", help="print the trace metadata").add_argument("trace")
+    sub.add_parser("check", help="compare uo_out against the reference model").add_argument("trace")
+    diff = sub.add_parser("diff", help="first cycle where two traces disagree")
+    diff.add_argument("a")
+    diff.add_argument("b")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        print(json.dumps(open_trace(args.trace).meta, indent=2))
+        return 0
+    if args.command == "check":
+        trace = open_trace(args.trace)
+        cycle = check_model(trace)
+        if cycle is None:
+            print(f"{len(trace)} cycles match the model")
+            return 0
+        print(f"uo_out differs from the model at cycle {cycle}")
+        return 1
+    a, b = open_trace(args.a), open_trace(args.b)
+    found = first_divergence(a, b)
+    if found is None:
+        print(f"{min(len(a), len(b))} cycles identical")
+        return 0
+    cycle, column = found
+    print(f"traces diverge at cycle {cycle} on {column}: "
+          f"{a.columns[column][cycle]:#04x} vs {b.columns[column][cycle]:#04x}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
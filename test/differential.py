@@ -0,0 +1,148 @@
+"""RTL vs gate-level differential runs on shared stimulus.
+
+The RTL build records ``uo_out`` once into a compact cycle trace
+(cycle_trace.py), using the fast preloaded playback. The gate-level
+netlist then replays the trace's inputs in test_replay_trace and checks
+only the ports, against the recorded values rather than the model. The GL
+run can be limited to the first ``--gl-cycles``, or sampled as
+``--windows`` windows of ``--window`` cycles spread over the trace, each
+started from the model state at that point (reset and an LDB restore, see
+snapshot.py). The first diverging cycle is reported.
+
+Usage::
+
+    python differential.py --seed 1 --cycles 1000000 --gl-cycles 20000
+    python differential.py --seed 1 --cycles 1000000 --windows 32 --window 256
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+from assembler import disassemble
+from cpu_model import CPUModel
+from driver import IDLE, PinDriver, resolve
+from run_regression import run_testcase
+from snapshot import Snapshot, restore
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_DIVERGENCE = re.compile(r"uo_out diverges from the reference at cycle (\d+).*")
+
+
+async def replay_trace(dut, reference, start=0, stop=None):
+    """Drive cycles ``start:stop`` of ``reference`` and check ``uo_out`` against it.
+
+    The design must already be in the state the reference had before
+    ``start``. Cycles where the reference recorded X are not checked.
+    Returns the number of cycles replayed.
+    """
+    stop = len(reference) if stop is None else min(stop, len(reference))
+    ui_in = reference.ui_in[start:stop].tolist()
+    uio_in = reference.uio_in[start:stop].tolist()
+    expected = reference.uo_out[start:stop].tolist()
+    known = reference.uo_known[start:stop].tolist()
+    driver = PinDriver(dut)
+
+    def check(index, actual):
+        if known[index] and actual != expected[index]:
+            found = "X" if actual is None else f"0x{actual:02X}"
+            raise AssertionError(
+                f"uo_out diverges from the reference at cycle {start + index} "
+                f"({disassemble(ui_in[index], uio_in[index])}): "
+                f"reference 0x{expected[index]:02X}, found {found}")
+
+    for index, inst in enumerate(zip(ui_in, uio_in)):
+        actual = await driver.cycle(*inst)
+        if index:
+            check(index - 1, resolve(actual))
+    if ui_in:
+        check(len(ui_in) - 1, resolve(await driver.cycle(*IDLE)))
+    return len(ui_in)
+
+
+def window_starts(cycles, windows, window):
+    """``windows`` start cycles spread evenly over the first ``cycles``."""
+    last = max(cycles - window, 0)
+    return sorted(set(np.linspace(0, last, windows, dtype=np.int64).tolist()))
+
+
+async def replay_windows(dut, reference, windows, window, cycles=None):
+    """Replay ``windows`` sampled windows of ``reference``, each from a restored state.
+
+    The state at each window start comes from the reference model, which
+    the recorded run was checked against. Returns the number of cycles replayed.
+    """
+    cycles = len(reference) if cycles is None else min(cycles, len(reference))
+    ui_in = reference.ui_in.tolist()
+    uio_in = reference.uio_in.tolist()
+    model = CPUModel()
+    position = replayed = 0
+    for start in window_starts(cycles, windows, window):
+        for inst in zip(ui_in[position:start], uio_in[position:start]):
+            model.step(*inst)
+        position = start
+        await restore(dut, Snapshot.from_model(model))
+        replayed += await replay_trace(dut, reference, start, min(start + window, cycles))
+    return replayed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RTL vs gate-level differential run")
+    parser.add_argument("--seed", type=int, default=1, help="RANDOM_SEED of the RTL run")
+    parser.add_argument("--cycles", type=int, default=100000, help="random instructions recorded on RTL")
+    parser.add_argument("--weights", default="", help="STIM_WEIGHTS of the RTL run")
+    parser.add_argument("--gl-cycles", type=int, default=0, help="replay only the first N cycles on GL")
+    parser.add_argument("--windows", type=int, default=0, help="replay N sampled windows on GL instead")
+    parser.add_argument("--window", type=int, default=256, help="cycles per sampled window")
+    parser.add_argument("--reuse-rtl", action="store_true", help="keep an existing RTL trace")
+    parser.add_argument("--outdir", default=os.path.join(TEST_DIR, "sim_build", "differential"))
+    args = parser.parse_args(argv)
+    args.outdir = os.path.abspath(args.outdir)
+
+    rtl_dir = os.path.join(args.outdir, "rtl")
+    # trace_from_env records each test under its own name
+    rtl_trace = os.path.join(rtl_dir, "trace", "test_random_preloaded")
+    if not (args.reuse_rtl and os.path.exists(os.path.join(rtl_trace, "meta.json"))):
+        print(f"recording {args.cycles} RTL cycles (seed {args.seed})", file=sys.stderr)
+        tests = run_testcase("test_random_preloaded", rtl_dir, {
+            "RANDOM_SEED": str(args.seed), "STIM_CYCLES": str(args.cycles),
+            "STIM_WEIGHTS": args.weights, "TRACE": os.path.dirname(rtl_trace), "DUMP": "off"})
+        if not all(t["passed"] for t in tests):
+            print(f"the RTL run itself fails, see {os.path.join(rtl_dir, 'sim.log')}", file=sys.stderr)
+            return 1
+
+    gl_dir = os.path.join(args.outdir, "gl")
+    print("replaying on the gate-level netlist", file=sys.stderr)
+    tests = run_testcase("test_replay_trace", gl_dir, {
+        "REFERENCE_TRACE": rtl_trace, "DIFF_CYCLES": str(args.gl_cycles),
+        "DIFF_WINDOWS": str(args.windows), "DIFF_WINDOW": str(args.window), "DUMP": "off"},
+        ["GATES=yes"])
+
+    passed = all(t["passed"] for t in tests)
+    report = {"seed": args.seed, "rtl_cycles": args.cycles, "passed": passed,
+              "gl_time": sum(t["time"] for t in tests), "divergence": None}
+    if not passed:
+        with open(os.path.join(gl_dir, "sim.log"), errors="replace") as f:
+            match = _DIVERGENCE.search(f.read())
+        if match:
+            report["divergence"] = {"cycle": int(match.group(1)), "message": match.group(0)}
+    with open(os.path.join(args.outdir, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    if passed:
+        print("gate level matches RTL on every checked cycle")
+        return 0
+    if report["divergence"]:
+        print(f"first divergence: {report['divergence']['message']}")
+    else:
+        print(f"gate-level run failed, see {os.path.join(gl_dir, 'sim.log')}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
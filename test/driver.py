@@ -0,0 +1,113 @@
+"""Low-overhead pin driver and monitor for the ``tb`` module in tb.v.
+
+``PinDriver`` looks up the signal handles once and does all of a cycle's
+work (sample ``uo_out``, apply ``ui_in``/``uio_in``) in a single
+falling-edge callback, writing the inputs immediately instead of through
+cocotb's scheduled-write queue.
+
+``PinDriver.run_preloaded`` goes further: it loads the program into the
+testbench's stimulus memory and lets the simulator play it back by itself,
+so long programs run in native simulator time and Python only sees the
+``uo_out`` responses once per chunk.
+"""
+
+from itertools import islice
+
+import cocotb
+from cocotb.triggers import FallingEdge, RisingEdge
+
+from assembler import pairs
+
+# Depth of stim_mem/resp_mem in tb.v
+STIM_DEPTH = 65536
+
+# Opcode 0100 is a NOP; it is held on the inputs while the design idles so
+# that stale instructions are not re-executed.
+IDLE = (0x40, 0x00)
+
+_HEX_DIGITS = set("0123456789abcdefABCDEF")
+
+
+def resolve(value):
+    """Integer value of a sampled signal, or ``None`` if it holds X/Z."""
+    return value.integer if value.is_resolvable else None
+
+
+def read_memh(path):
+    """Parse a $writememh dump into a list of ints, with ``None`` for X/Z words."""
+    values = []
+    with open(path) as f:
+        for line in f:
+            word = line.split("//")[0].strip()
+            if not word or word.startswith("@"):
+                continue
+            values.append(int(word, 16) if _HEX_DIGITS.issuperset(word) else None)
+    return values
+
+
+def write_memh(path, chunk):
+    """Write ``(ui_in, uio_in)`` pairs as the {ui_in, uio_in} words $readmemh expects."""
+    with open(path, "w") as f:
+        f.writelines(f"{ui_in:02x}{uio_in:02x}\n" for ui_in, uio_in in chunk)
+
+
+class PinDriver:
+    """Drive and sample the tt_um_8bit_cpu pins through cached handles."""
+
+    def __init__(self, dut):
+        self.dut = dut
+        self._ui_in = dut.ui_in
+        self._uio_in = dut.uio_in
+        self._uo_out = dut.uo_out
+        self._falling = FallingEdge(dut.clk)
+
+    async def cycle(self, ui_in, uio_in):
+        """Wait for the falling edge, sample ``uo_out`` and apply the next inputs.
+
+        Returns the sampled ``uo_out`` (the result of the previous instruction).
+        """
+        await self._falling
+        value = self._uo_out.value
+        self._ui_in.setimmediatevalue(ui_in)
+        self._uio_in.setimmediatevalue(uio_in)
+        return value
+
+    async def sample(self):
+        """Wait for the falling edge and return ``uo_out`` without driving anything."""
+        await self._falling
+        return self._uo_out.value
+
+    async def run_preloaded(self, program):
+        """Play ``program`` through the testbench stimulus memory.
+
+        ``program`` is a packed binary program or an iterable of
+        ``(ui_in, uio_in)`` pairs; it is consumed lazily, ``STIM_DEPTH``
+        cycles at a time. For each chunk this yields ``(chunk, responses)``,
+        where ``responses`` holds ``uo_out`` after every instruction
+        (``None`` for X).
+        """
+        dut = self.dut
+        stim_file = cocotb.plusargs.get("stim_file", "stim.hex")
+        resp_file = cocotb.plusargs.get("resp_file", "resp.hex")
+        if isinstance(program, (bytes, bytearray)):
+            program = pairs(program)
+        program = iter(program)
+
+        await self._falling
+        self._ui_in.setimmediatevalue(IDLE[0])
+        self._uio_in.setimmediatevalue(IDLE[1])
+        while True:
+            chunk = list(islice(program, STIM_DEPTH))
+            if not chunk:
+                return
+            write_memh(stim_file, chunk)
+
+            dut.stim_len.value = len(chunk)
+            dut.stim_load.value = 1
+            await self._falling
+            dut.stim_load.value = 0
+            dut.stim_run.value = 1
+            await RisingEdge(dut.stim_done)
+            dut.stim_run.value = 0
+            yield chunk, read_memh(resp_file)
+            await self._falling
@@ -0,0 +1,590 @@
+"""Run the cocotb tests without a simulator, on a Python model of the design.
+
+Most edits are to the test logic, and a full Icarus compile and run is a
+slow way to try them. ``fastsim`` runs the same ``@cocotb.test()``
+coroutines in-process, against a ``dut`` built from Python objects:
+
+* the ``tb`` ports (``ui_in``, ``uio_in``, ``uo_out``, ``clk``, ``rst_n``,
+  ``ena``...), the tb.v controls (``dump_scope``, ``dump_on``) and the
+  stimulus memory playback behind ``stim_load``/``stim_run``, so
+  driver.run_preloaded works unchanged;
+* ``myCPU``: the flops (``RF1.reg_data[i]``, ``processor_stat``,
+  ``data_out``), readable and writable as in a real simulator, and the
+  combinational signals of the ``always @(*)`` decode (``alu_out``,
+  ``alu_in1``, ``r_reg1``, ``w_data``, ``write``...), computed from the
+  current inputs on demand.
+
+The flops are a CPUModel stepped on each rising edge of ``clk``. As in
+the simulator, code resumed by that edge still sees the values from
+before it, and writes go to the design at once (there is no separate
+write phase to wait for). X is kept as ``None`` and read back as an
+all-``x`` BinaryValue.
+
+The real cocotb Clock, Timer, edge triggers, ClockCycles and start_soon
+are used; a small event loop here schedules them, so the test modules
+need no changes. First/Combine/Event and friends are not supported. This
+checks the test logic against the model, not the RTL against anything:
+the simulator, at RTL and gate level, stays the signoff backend.
+
+Usage::
+
+    python fastsim.py                                   # every test in test.py
+    python fastsim.py -k test_random_lockstep --seed 1234
+    make fast TESTCASE=test_random_lockstep STIM_CYCLES=100000
+"""
+
+import argparse
+import heapq
+import importlib
+import logging
+import os
+import random
+import sys
+import time
+from collections import deque
+
+import cocotb
+import cocotb.decorators
+import cocotb.utils
+from cocotb.binary import BinaryValue
+from cocotb.triggers import (Edge, FallingEdge, NextTimeStep, NullTrigger, ReadOnly, ReadWrite, RisingEdge,
+                             Timer)
+
+from cpu_model import LDB, MNEMONICS, MVR, OPERANDS, RDS, REG_COUNT, STB, CPUModel, alu, decode
+from driver import IDLE, read_memh
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Time unit of the event loop: picoseconds, as timescale 1ns / 1ps in tb.v
+PRECISION = -12
+
+_binary_values = {}
+
+
+def _binary(value, width):
+    """Cached read-only BinaryValue for ``value`` (``None`` for X)."""
+    key = (value, width)
+    binary = _binary_values.get(key)
+    if binary is None:
+        if value is None:
+            binary = BinaryValue("x" * width, n_bits=width)
+        else:
+            binary = BinaryValue(value, n_bits=width, bigEndian=False)
+        _binary_values[key] = binary
+    return binary
+
+
+def _to_int(value):
+    if isinstance(value, BinaryValue):
+        return value.integer if value.is_resolvable else None
+    return None if value is None else int(value)
+
+
+class Signal:
+    """A handle with the parts of the cocotb handle API the tests use.
+
+    Stored signals hold a value and can be waited on with edge triggers;
+    pass ``get`` (and ``set``) to back the handle by the design instead.
+    """
+
+    def __init__(self, path, width=1, value=None, get=None, set=None, on_change=None):
+        self._path = path
+        self._name = path.rsplit(".", 1)[-1]
+        self.width = width
+        self._mask = (1 << width) - 1
+        self._value = value
+        self._get = get
+        self._set = set
+        self._on_change = on_change
+        self._waiters = {RisingEdge: [], FallingEdge: [], Edge: []}
+
+    @property
+    def value(self):
+        return _binary(self.get(), self.width)
+
+    @value.setter
+    def value(self, value):
+        self.set(value)
+
+    def setimmediatevalue(self, value):
+        self.set(value)
+
+    def get(self):
+        return self._value if self._get is None else self._get()
+
+    def set(self, value):
+        value = _to_int(value)
+        if value is not None:
+            value &= self._mask
+        if self._get is not None:
+            if self._set is None:
+                raise TypeError(f"{self._path} is combinational in fastsim and cannot be written")
+            self._set(value)
+            return
+        old = self._value
+        if value == old:
+            return
+        self._value = value
+        if self._on_change is not None:
+            self._on_change(old, value)
+        waiters = self._waiters
+        woken = waiters[Edge]
+        if value == 1 and waiters[RisingEdge]:
+            woken = woken + waiters[RisingEdge]
+            waiters[RisingEdge] = []
+        elif value == 0 and waiters[FallingEdge]:
+            woken = woken + waiters[FallingEdge]
+            waiters[FallingEdge] = []
+        if woken:
+            waiters[Edge] = []
+            cocotb.scheduler.wake(woken)
+
+    def wait(self, kind, task, trigger):
+        if self._get is not None:
+            raise NotImplementedError(f"fastsim cannot wait for an edge on combinational {self._path}")
+        self._waiters[kind].append((task, trigger))
+
+    def __len__(self):
+        return self.width
+
+    def __repr__(self):
+        return f"<fastsim {self._path} = {self.value}>"
+
+
+class Scope:
+    """A level of hierarchy: attributes are child Signals or Scopes."""
+
+    def __init__(self, path):
+        self._path = path
+        self._name = path.rsplit(".", 1)[-1]
+
+    def __repr__(self):
+        return f"<fastsim scope {self._path}>"
+
+
+class Array(Scope):
+    """An unpacked array such as ``reg_data``, indexed like a cocotb handle."""
+
+    def __init__(self, path, items):
+        super().__init__(path)
+        self._items = items
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+def _decode(ui_in, uio_in, regs):
+    """The values of the ``always @(*)`` decode in tt_um_8bit_cpu, ``None`` for X."""
+    names = ("inst", "r_reg1", "r_reg2", "w_reg", "w_data", "write", "r_d1", "r_d2",
+             "alu_in1", "alu_in2", "alu_op", "alu_out", "alu_c")
+    comb = dict.fromkeys(names)
+    comb["write"] = 0
+    if ui_in is None:
+        return comb
+    inst, fields = decode(ui_in, 0 if uio_in is None else uio_in)
+    comb["inst"] = inst
+    operands = OPERANDS.get(inst)
+    if operands is None:
+        return comb
+    if uio_in is None and inst not in (STB, RDS):
+        return comb
+
+    def read(reg):
+        return None if reg is None or reg >= REG_COUNT else regs[reg]
+
+    rd1, rd2, wr = operands
+    comb["r_reg1"] = None if rd1 is None else fields[rd1]
+    comb["r_reg2"] = None if rd2 is None else fields[rd2]
+    comb["w_reg"] = None if wr is None else fields[wr]
+    comb["r_d1"], comb["r_d2"] = read(comb["r_reg1"]), read(comb["r_reg2"])
+    comb["write"] = int(wr is not None)
+    if inst == LDB:
+        comb["w_data"] = uio_in
+    elif inst == MVR:
+        comb["w_data"] = comb["r_d1"]
+    elif inst >= 0b1000:
+        comb["alu_op"] = inst & 0b111
+        comb["alu_in1"], comb["alu_in2"] = comb["r_d1"], comb["r_d2"]
+        comb["alu_out"], comb["alu_c"] = alu(comb["alu_op"], comb["r_d1"], comb["r_d2"])
+        comb["w_data"] = comb["alu_out"]
+    return comb
+
+
+_COMB_WIDTHS = {"inst": 4, "r_reg1": 4, "r_reg2": 4, "w_reg": 4, "w_data": 8, "write": 1, "r_d1": 8,
+                "r_d2": 8, "alu_in1": 8, "alu_in2": 8, "alu_op": 3, "alu_out": 8, "alu_c": 1}
+
+
+class FastDut(Scope):
+    """The ``tb`` module of tb.v around a model of tt_um_8bit_cpu."""
+
+    def __init__(self):
+        super().__init__("tb")
+        # Power-up state is X until the first reset
+        self._cpu = CPUModel()
+        self._cpu.regs = [None] * REG_COUNT
+        self._cpu.processor_stat = self._cpu.data_out = None
+        self._next = None
+
+        self.clk = Signal("tb.clk", on_change=self._clock)
+        self.rst_n = Signal("tb.rst_n", on_change=self._reset)
+        self.ena = Signal("tb.ena")
+        self.ui_in = Signal("tb.ui_in", 8)
+        self.uio_in = Signal("tb.uio_in", 8)
+        self.uo_out = Signal("tb.uo_out", 8, get=lambda: self._cpu.data_out)
+        self.uio_out = Signal("tb.uio_out", 8, get=lambda: 0)
+        self.uio_oe = Signal("tb.uio_oe", 8, get=lambda: 0)
+        self.dump_scope = Signal("tb.dump_scope", 2, 3)
+        self.dump_on = Signal("tb.dump_on", 1, 1)
+
+        self._stim_mem, self._resp_mem, self._stim_pc = [], [], 0
+        self.stim_load = Signal("tb.stim_load", 1, 0, on_change=self._stim_load)
+        self.stim_run = Signal("tb.stim_run", 1, 0, on_change=self._stim_run)
+        self.stim_done = Signal("tb.stim_done", 1, 0)
+        self.stim_len = Signal("tb.stim_len", 32, 0)
+        self.stim_pc = Signal("tb.stim_pc", 32, get=lambda: self._stim_pc)
+
+        self.myCPU = self._build_cpu()
+
+    def _build_cpu(self):
+        cpu = Scope("tb.myCPU")
+        model = self._cpu
+
+        def flop(name, width, path):
+            return Signal(path, width, get=lambda: getattr(model, name),
+                          set=lambda value: setattr(model, name, value))
+
+        def reg(index):
+            def write(value):
+                model.regs[index] = value
+            return Signal(f"tb.myCPU.RF1.reg_data[{index}]", 8, get=lambda: model.regs[index], set=write)
+
+        def comb(name, path):
+            return Signal(path, _COMB_WIDTHS[name], get=lambda: self._comb()[name])
+
+        cpu.processor_stat = flop("processor_stat", 1, "tb.myCPU.processor_stat")
+        cpu.data_out = flop("data_out", 8, "tb.myCPU.data_out")
+        for name in _COMB_WIDTHS:
+            setattr(cpu, name, comb(name, f"tb.myCPU.{name}"))
+        cpu.RF1 = Scope("tb.myCPU.RF1")
+        cpu.RF1.reg_data = Array("tb.myCPU.RF1.reg_data", [reg(i) for i in range(REG_COUNT)])
+        for name, port in (("write", "write"), ("w_reg", "w_reg"), ("w_data", "w_d"), ("r_reg1", "r_reg1"),
+                           ("r_reg2", "r_reg2"), ("r_d1", "r_d1"), ("r_d2", "r_d2")):
+            setattr(cpu.RF1, port, comb(name, f"tb.myCPU.RF1.{port}"))
+        cpu.ALU1 = Scope("tb.myCPU.ALU1")
+        for name, port in (("alu_in1", "in1"), ("alu_in2", "in2"), ("alu_op", "op"), ("alu_out", "out"),
+                           ("alu_c", "c")):
+            setattr(cpu.ALU1, port, comb(name, f"tb.myCPU.ALU1.{port}"))
+        return cpu
+
+    def _comb(self):
+        return _decode(self.ui_in.get(), self.uio_in.get(), self._cpu.regs)
+
+    def _clock(self, old, new):
+        if new == 1 and old == 0:
+            self._posedge()
+        elif new == 0 and old == 1:
+            self._negedge()
+
+    def _posedge(self):
+        # Flops sample now; code resumed by this edge still reads the old state
+        if self.rst_n.get() == 0 or self._next is not None:
+            return
+        model = self._cpu.copy()
+        ui_in, uio_in = self.ui_in.get(), self.uio_in.get()
+        if ui_in is not None:
+            inst, fields = decode(ui_in, 0 if uio_in is None else uio_in)
+            if uio_in is not None or inst not in MNEMONICS or inst in (STB, RDS):
+                model.step(ui_in, uio_in or 0)
+            elif inst == LDB:
+                model.write(fields[0], None)
+            else:
+                raise NotImplementedError(f"fastsim does not model X on uio_in for opcode {inst:04b}")
+        # else: X on ui_in matches no case item, the default holds every flop
+        self._next = model
+        cocotb.scheduler.at_end_of_step(self._commit)
+
+    def _commit(self):
+        model, self._next = self._next, None
+        if model is not None:
+            cpu = self._cpu
+            cpu.regs[:] = model.regs
+            cpu.processor_stat, cpu.data_out = model.processor_stat, model.data_out
+
+    def _reset(self, old, new):
+        if new == 0:
+            self._next = None
+            self._cpu.regs[:] = [0] * REG_COUNT
+            self._cpu.processor_stat = self._cpu.data_out = 0
+
+    # Stimulus memory playback, as the always blocks in tb.v
+
+    def _stim_load(self, old, new):
+        if new == 1:
+            self._stim_mem = read_memh(cocotb.plusargs.get("stim_file", "stim.hex"))
+
+    def _stim_run(self, old, new):
+        if new == 1:
+            self._stim_pc = 0
+            self.stim_done.set(0)
+
+    def _negedge(self):
+        if self.stim_run.get() != 1 or self.stim_done.get() == 1:
+            return
+        pc, length = self._stim_pc, self.stim_len.get()
+        if pc > 0:
+            resp = self._resp_mem
+            if len(resp) < pc:
+                resp.extend([None] * (pc - len(resp)))
+            resp[pc - 1] = self._cpu.data_out
+        if pc == length:
+            with open(cocotb.plusargs.get("resp_file", "resp.hex"), "w") as f:
+                f.writelines("xx\n" if value is None else f"{value:02x}\n" for value in self._resp_mem[:length])
+            self.ui_in.set(IDLE[0])
+            self.uio_in.set(IDLE[1])
+            self.stim_done.set(1)
+        else:
+            word = self._stim_mem[pc] if pc < len(self._stim_mem) else None
+            self.ui_in.set(None if word is None else word >> 8)
+            self.uio_in.set(None if word is None else word & 0xFF)
+            self._stim_pc = pc + 1
+
+
+class Task:
+    """A coroutine run by the Scheduler, returned by ``cocotb.start_soon``."""
+
+    def __init__(self, coro):
+        self._coro = coro
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._joiners = []
+        self.__name__ = getattr(coro, "__qualname__", repr(coro))
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def kill(self):
+        if not self._done:
+            self._coro.close()
+            self._finish()
+
+    def _finish(self, result=None, exception=None):
+        self._done = True
+        self._result, self._exception = result, exception
+        if self._joiners:
+            cocotb.scheduler.wake([(task, self) for task in self._joiners])
+            self._joiners = []
+
+    def __await__(self):
+        if not self._done:
+            yield self
+        return self.result()
+
+    def __repr__(self):
+        return f"<fastsim task {self.__name__}>"
+
+
+class Scheduler:
+    """Event loop for one test: a ready queue, end-of-step callbacks and a timer heap."""
+
+    def __init__(self):
+        self.now = 0
+        self._ready = deque()
+        self._end_of_step = []
+        self._read_phase = []
+        self._timers = []
+        self._seq = 0
+        self.failure = None
+
+    def start_soon(self, coro):
+        task = coro if isinstance(coro, Task) else Task(coro)
+        self._ready.append((task, None))
+        return task
+
+    def create_task(self, coro):
+        return Task(coro)
+
+    def wake(self, waiters):
+        self._ready.extend(waiters)
+
+    def at_end_of_step(self, callback):
+        self._end_of_step.append(callback)
+
+    def _resume(self, task, value):
+        try:
+            trigger = task._coro.send(value)
+        except StopIteration as e:
+            task._finish(result=e.value)
+            return
+        except BaseException as e:
+            task._finish(exception=e)
+            if self.failure is None:
+                self.failure = (task, e)
+            return
+        try:
+            self._wait(task, trigger)
+        except NotImplementedError as e:
+            task._coro.close()
+            task._finish(exception=e)
+            if self.failure is None:
+                self.failure = (task, e)
+
+    def _wait(self, task, trigger):
+        kind = type(trigger)
+        if kind is Timer:
+            self._seq += 1
+            heapq.heappush(self._timers, (self.now + trigger.sim_steps, self._seq, task, trigger))
+        elif kind in (RisingEdge, FallingEdge, Edge):
+            # Duck-typed, so wrappers such as profiling.ProfiledHandle work too
+            wait = getattr(trigger.signal, "wait", None)
+            if wait is None:
+                raise NotImplementedError(f"fastsim cannot wait on {trigger.signal!r}")
+            wait(kind, task, trigger)
+        elif kind is NullTrigger:
+            self._ready.append((task, trigger))
+        elif kind in (ReadOnly, ReadWrite):
+            self._read_phase.append((task, trigger))
+        elif kind is NextTimeStep:
+            self._seq += 1
+            heapq.heappush(self._timers, (self.now + 1, self._seq, task, trigger))
+        elif kind is Task:
+            if trigger.done():
+                self._ready.append((task, trigger))
+            else:
+                trigger._joiners.append(task)
+        else:
+            raise NotImplementedError(f"fastsim does not support {trigger!r}")
+
+    def run(self, main):
+        """Run until ``main`` finishes or any task raises; returns the end time in ps."""
+        ready, timers = self._ready, self._timers
+        while True:
+            while ready or self._end_of_step or self._read_phase:
+                while ready:
+                    task, value = ready.popleft()
+                    if not task._done:
+                        self._resume(task, value)
+                        if self.failure is not None or main._done:
+                            return self.now
+                callbacks, self._end_of_step = self._end_of_step, []
+                for callback in callbacks:
+                    callback()
+                ready.extend(self._read_phase)
+                self._read_phase = []
+            if not timers:
+                raise RuntimeError("the test is waiting for something that will never happen")
+            self.now = timers[0][0]
+            while timers and timers[0][0] == self.now:
+                _, _, task, trigger = heapq.heappop(timers)
+                ready.append((task, trigger))
+
+
+def _install(scheduler, dut, seed):
+    """Set the cocotb globals a simulator run would have set."""
+    cocotb.utils._get_simulator_precision = lambda: PRECISION
+    cocotb.scheduler = scheduler
+    cocotb.top = dut
+    cocotb.log = logging.getLogger("cocotb")
+    cocotb.RANDOM_SEED = seed
+    cocotb.SIM_NAME = "fastsim"
+    cocotb.SIM_VERSION = "1"
+    if cocotb.plusargs is None:
+        cocotb.plusargs = {}
+    random.seed(seed)
+
+
+def collect(module, testcase=None):
+    """``@cocotb.test()`` functions of ``module`` in definition order, filtered by ``testcase``."""
+    tests = [obj for obj in vars(module).values() if isinstance(obj, cocotb.decorators.test)]
+    if testcase:
+        names = testcase.split(",")
+        missing = set(names) - {t.name for t in tests}
+        if missing:
+            raise ValueError(f"no test named {', '.join(sorted(missing))} in {module.__name__}")
+        tests = [t for t in tests if t.name in names]
+    return tests
+
+
+def run_test(test, seed):
+    """Run one cocotb test on a fresh FastDut; returns ``(outcome, sim_ps, message)``."""
+    scheduler = Scheduler()
+    dut = FastDut()
+    _install(scheduler, dut, seed)
+    main = scheduler.start_soon(test._func(dut))
+    try:
+        sim_time = scheduler.run(main)
+        failure = scheduler.failure
+    except RuntimeError as e:
+        sim_time, failure = scheduler.now, (main, e)
+    if failure is None:
+        error = None
+    else:
+        error = failure[1]
+        if failure[0] is not main:
+            main.kill()
+
+    if error is None:
+        if test.expect_fail or test.expect_error:
+            return "FAIL", sim_time, "passed, but a failure was expected"
+        return "PASS", sim_time, ""
+    if test.expect_fail and isinstance(error, AssertionError):
+        return "PASS", sim_time, "failed as expected"
+    if test.expect_error and isinstance(error, test.expect_error):
+        return "PASS", sim_time, "errored as expected"
+    cocotb.log.error(f"{test.name} failed", exc_info=(type(error), error, error.__traceback__))
+    return "FAIL", sim_time, f"{type(error).__name__}: {error}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run cocotb tests on the Python model, without a simulator")
+    parser.add_argument("--module", default=os.getenv("MODULE", "test"), help="test module (default: test)")
+    parser.add_argument("-k", "--testcase", default=os.getenv("TESTCASE"), help="comma-separated test names")
+    parser.add_argument("--seed", type=int, default=None, help="RANDOM_SEED (default: time based)")
+    args = parser.parse_args(argv)
+
+    seed = args.seed
+    if seed is None:
+        seed = int(os.getenv("RANDOM_SEED") or time.time())
+    logging.basicConfig(level=os.getenv("COCOTB_LOG_LEVEL", "INFO"),
+                        format="%(levelname)-8s %(name)-20s %(message)s")
+    if TEST_DIR not in sys.path:
+        sys.path.insert(0, TEST_DIR)
+    cocotb.plusargs = {}
+    cocotb.log = logging.getLogger("cocotb")
+    module = importlib.import_module(args.module)
+    tests = collect(module, args.testcase)
+    cocotb.log.info(f"fastsim: {len(tests)} tests from {args.module}, seed {seed}")
+
+    results = []
+    for test in tests:
+        if test.skip:
+            results.append((test.name, "SKIP", 0, 0.0, ""))
+            continue
+        cocotb.log.info(f"running {test.name}")
+        start = time.perf_counter()
+        outcome, sim_time, message = run_test(test, seed)
+        results.append((test.name, outcome, sim_time, time.perf_counter() - start, message))
+
+    width = max([len(name) for name, *_ in results] + [4])
+    print(f"{'TEST':<{width}}  {'STATUS':<6}  {'SIM TIME (ns)':>14}  {'REAL (s)':>9}")
+    for name, outcome, sim_time, real, message in results:
+        print(f"{name:<{width}}  {outcome:<6}  {sim_time / 1000:>14.0f}  {real:>9.2f}  {message}")
+    failed = sum(outcome == "FAIL" for _, outcome, *_ in results)
+    print(f"TESTS={len(results)} PASS={sum(r[1] == 'PASS' for r in results)} FAIL={failed} "
+          f"SKIP={sum(r[1] == 'SKIP' for r in results)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
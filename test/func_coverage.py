@@ -0,0 +1,256 @@
+"""Functional coverage of the ISA, sampled alongside the lockstep checks.
+
+Bins, all kept as counters in one flat uint32 array so that merging
+shards is a single array add:
+
+* ``fields``: every opcode x operand field it uses x register index < REG_COUNT,
+* ``out_of_range``: the same, for register indices 14 and 15,
+* ``pairs``: back-to-back opcode pairs (the NOP opcodes count as one class),
+* ``raw``: a write followed on the next cycle by a read of the same register,
+* ``waw``: writes to the same register on consecutive cycles,
+* ``carry``: ``processor_stat`` before/after each ALU op (only ADD, SUB and INC can set it).
+
+run_lockstep and run_preloaded call ``sample`` once per instruction.
+``until_saturated`` ends a random stream once no new bin has been hit
+for a number of cycles, and ``export`` writes the counters to
+``COVERAGE_FILE`` for run_regression.py to merge.
+
+Usage::
+
+    python func_coverage.py sim_build/regression/shard_*/coverage.npz
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from cpu_model import ADD, INC, MNEMONICS, NOPS, OPERANDS, REG_COUNT, SUB
+
+CLASSES = tuple(MNEMONICS[op] for op in sorted(MNEMONICS)) + ("NOP",)
+FIELDS = ("r1", "r2", "r3")
+_CLASS = [CLASSES.index(MNEMONICS.get(op, "NOP")) for op in range(16)]
+_NC = len(CLASSES)
+
+# Per opcode: operand fields read, field written (None for none)
+_READS = [tuple(f for f in OPERANDS.get(op, (None,) * 3)[:2] if f is not None) for op in range(16)]
+_WRITE = [OPERANDS.get(op, (None,) * 3)[2] for op in range(16)]
+_USED = [tuple(sorted(set(_READS[op]) | ({_WRITE[op]} - {None}))) for op in range(16)]
+_ALU = [op >= 0b1000 and op not in NOPS for op in range(16)]
+
+_LAYOUT = (
+    ("fields", (_NC, 3, 16)),
+    ("pairs", (_NC, _NC)),
+    ("raw", (_NC, _NC)),
+    ("waw", (_NC, _NC)),
+    ("carry", (_NC, 2, 2)),
+)
+_SLICES = {}
+_offset = 0
+for _name, _shape in _LAYOUT:
+    _SLICES[_name] = (slice(_offset, _offset + int(np.prod(_shape))), _shape)
+    _offset += int(np.prod(_shape))
+SIZE = _offset
+
+_FIELDS_AT = _SLICES["fields"][0].start
+_PAIRS_AT = _SLICES["pairs"][0].start
+_RAW_AT = _SLICES["raw"][0].start
+_WAW_AT = _SLICES["waw"][0].start
+_CARRY_AT = _SLICES["carry"][0].start
+
+
+def _goals():
+    """Per coverage group: ``(layout name, bool mask of the bins that can be hit)``."""
+    used = np.zeros((_NC, 3, 16), dtype=bool)
+    for op in MNEMONICS:
+        used[_CLASS[op], list(_USED[op]), :] = True
+    in_range = used.copy()
+    in_range[..., REG_COUNT:] = False
+
+    writers = sorted({_CLASS[op] for op in MNEMONICS if _WRITE[op] is not None})
+    readers = sorted({_CLASS[op] for op in MNEMONICS if _READS[op]})
+    raw = np.zeros((_NC, _NC), dtype=bool)
+    raw[np.ix_(writers, readers)] = True
+    waw = np.zeros((_NC, _NC), dtype=bool)
+    waw[np.ix_(writers, writers)] = True
+
+    carry = np.zeros((_NC, 2, 2), dtype=bool)
+    for op in MNEMONICS:
+        if _ALU[op]:
+            carry[_CLASS[op], :, 0] = True
+            carry[_CLASS[op], :, 1] = op in (ADD, SUB, INC)
+
+    return {
+        "fields": ("fields", in_range),
+        "out_of_range": ("fields", used & ~in_range),
+        "pairs": ("pairs", np.ones((_NC, _NC), dtype=bool)),
+        "raw": ("raw", raw),
+        "waw": ("waw", waw),
+        "carry": ("carry", carry),
+    }
+
+
+GROUPS = _goals()
+GOAL = np.zeros(SIZE, dtype=bool)
+for _layout, _mask in GROUPS.values():
+    GOAL[_SLICES[_layout][0]] |= _mask.ravel()
+GOAL_BINS = int(np.count_nonzero(GOAL))
+
+
+def describe(group, index):
+    """Readable name of bin ``index`` (a tuple, as from ``holes``) in ``group``."""
+    if group in ("fields", "out_of_range"):
+        cls, field, value = index
+        return f"{CLASSES[cls]} {FIELDS[field]}={value}"
+    if group == "pairs":
+        return f"{CLASSES[index[0]]} -> {CLASSES[index[1]]}"
+    if group in ("raw", "waw"):
+        return f"{CLASSES[index[0]]} -> {CLASSES[index[1]]} same register"
+    cls, before, after = index
+    return f"{CLASSES[cls]} carry {before} -> {after}"
+
+
+class Coverage:
+    """Coverage counters for one run; see the module docstring for the bins."""
+
+    def __init__(self, counts=None):
+        self.counts = np.zeros(SIZE, dtype=np.uint32) if counts is None else counts
+        self._prev = None       # (class, register written) of the previous instruction
+        self._carry = 0
+
+    def view(self, layout):
+        """Counters of one ``_LAYOUT`` entry, shaped as its bins."""
+        where, shape = _SLICES[layout]
+        return self.counts[where].reshape(shape)
+
+    def sample(self, ui_in, uio_in, carry):
+        """Count one executed instruction; ``carry`` is ``processor_stat`` after it (None for X)."""
+        counts = self.counts
+        inst = ui_in >> 4
+        cls = _CLASS[inst]
+        fields = (ui_in & 0xF, uio_in >> 4, uio_in & 0xF)
+
+        for field in _USED[inst]:
+            counts[_FIELDS_AT + (cls * 3 + field) * 16 + fields[field]] += 1
+
+        prev = self._prev
+        if prev is not None:
+            prev_cls, written = prev
+            counts[_PAIRS_AT + prev_cls * _NC + cls] += 1
+            if written is not None:
+                if any(fields[field] == written for field in _READS[inst]):
+                    counts[_RAW_AT + prev_cls * _NC + cls] += 1
+                if _WRITE[inst] is not None and fields[_WRITE[inst]] == written:
+                    counts[_WAW_AT + prev_cls * _NC + cls] += 1
+
+        field = _WRITE[inst]
+        written = fields[field] if field is not None and fields[field] < REG_COUNT else None
+        self._prev = (cls, written)
+
+        if _ALU[inst] and carry is not None and self._carry is not None:
+            counts[_CARRY_AT + (cls * 2 + self._carry) * 2 + carry] += 1
+        self._carry = carry
+
+    def hits(self):
+        """Number of reachable bins hit at least once."""
+        return int(np.count_nonzero(self.counts[GOAL]))
+
+    def holes(self, groups=None):
+        """``(group, index)`` of every reachable bin not hit yet."""
+        holes = []
+        for group in groups or GROUPS:
+            layout, mask = GROUPS[group]
+            missing = mask & (self.view(layout) == 0)
+            holes += [(group, tuple(int(i) for i in index)) for index in np.argwhere(missing)]
+        return holes
+
+    def summary(self):
+        """Hit/total bins and percentage per group, plus a ``total`` entry."""
+        report = {}
+        for group, (layout, mask) in GROUPS.items():
+            hit = int(np.count_nonzero(self.view(layout)[mask]))
+            bins = int(np.count_nonzero(mask))
+            report[group] = {"hit": hit, "bins": bins, "percent": 100.0 * hit / bins}
+        hit = self.hits()
+        report["total"] = {"hit": hit, "bins": GOAL_BINS, "percent": 100.0 * hit / GOAL_BINS}
+        return report
+
+    def merge(self, other):
+        """Add ``other``'s counters into this one (saturating is not an issue at uint32)."""
+        self.counts += other.counts
+        return self
+
+    def until_saturated(self, program, patience, interval=256):
+        """Pass ``program`` through until ``patience`` cycles go by without a new bin.
+
+        Also stops once every bin is hit. Coverage is checked every
+        ``interval`` instructions; the stream is consumed lazily, so the
+        counts seen are those of the instructions already executed.
+        """
+        best = self.hits()
+        last = 0
+        for cycle, inst in enumerate(program):
+            if cycle % interval == 0:
+                hits = self.hits()
+                if hits > best:
+                    best, last = hits, cycle
+                if hits == GOAL_BINS or cycle - last >= patience:
+                    return
+            yield inst
+
+    def save(self, path):
+        np.savez_compressed(path, counts=self.counts)
+
+    @classmethod
+    def load(cls, path):
+        counts = np.load(path)["counts"]
+        if counts.shape != (SIZE,):
+            raise ValueError(f"{path}: coverage layout does not match this version ({counts.shape[0]} bins)")
+        return cls(counts.astype(np.uint32))
+
+    def export(self):
+        """Add the counts to ``COVERAGE_FILE``, if set, and return this run's summary.
+
+        Every test of a simulator run adds to the same file; run_regression.py
+        removes it before each shard.
+        """
+        path = os.getenv("COVERAGE_FILE")
+        if path:
+            total = Coverage.load(path).merge(self) if os.path.exists(path) else self
+            total.save(path)
+        return self.summary()
+
+
+def merge_files(paths):
+    """Sum of the coverage saved in ``paths``."""
+    total = Coverage()
+    for path in paths:
+        total.merge(Coverage.load(path))
+    return total
+
+
+def format_summary(summary):
+    return "\n".join(f"{group:>12}: {s['hit']:5d}/{s['bins']:<5d} {s['percent']:6.2f}%"
+                     for group, s in summary.items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge and summarise coverage files")
+    parser.add_argument("files", nargs="+", help="coverage .npz files")
+    parser.add_argument("--holes", type=int, default=20, help="list up to this many holes per group")
+    args = parser.parse_args(argv)
+
+    coverage = merge_files(args.files)
+    print(format_summary(coverage.summary()))
+    for group in GROUPS:
+        holes = coverage.holes([group])
+        for _, index in holes[:args.holes]:
+            print(f"hole {group}: {describe(group, index)}")
+        if len(holes) > args.holes:
+            print(f"hole {group}: ... {len(holes) - args.holes} more")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
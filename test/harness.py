@@ -0,0 +1,181 @@
+"""Shared cocotb plumbing for the tt_um_8bit_cpu tests.
+
+The tests only drive pins here: every check is done against the Python
+reference model in cpu_model.py, once per clock cycle.
+"""
+
+import json
+import os
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles
+
+import profiling
+from assembler import disassemble
+from cpu_model import CPUModel, matches
+from driver import IDLE, PinDriver, resolve
+
+
+async def reset_dut(dut, cycles=5):
+    """Start the 100 MHz clock and apply the reset sequence used by every test."""
+    start_clock(dut)
+    await apply_reset(dut, cycles)
+
+
+def start_clock(dut):
+    """Start the 100 MHz clock, once per test."""
+    clock = Clock(dut.clk, 10, units="ns")
+    cocotb.start_soon(clock.start())
+
+
+async def apply_reset(dut, cycles=5):
+    """Reset the design with the clock already running."""
+    dut.ena.value = 1
+    dut.ui_in.value, dut.uio_in.value = IDLE
+    dut.rst_n.value = 0
+    await ClockCycles(dut.clk, cycles)  # Hold reset
+    dut.rst_n.value = 1
+    await ClockCycles(dut.clk, cycles)  # Wait for a few clock cycles after reset
+
+
+def check_output(actual, expected, cycle, inst=None):
+    """Compare a sampled ``uo_out`` (``None`` for X) against the model's expected value.
+
+    ``inst`` is the ``(ui_in, uio_in)`` pair executed on that cycle, for the report.
+    """
+    if not matches(expected, actual):
+        executed = f" ({disassemble(*inst)})" if inst is not None else ""
+        found = "X" if actual is None else f"0x{actual:02X}"
+        raise AssertionError(
+            f"uo_out mismatch after cycle {cycle}{executed}: "
+            f"expected 0x{expected:02X}, found {found}"
+        )
+
+
+def _check_with_probe(actual, expected, cycle, inst, model, probe):
+    """check_output, adding the probe's view of the internal state on a mismatch."""
+    try:
+        check_output(actual, expected, cycle, inst)
+    except AssertionError as e:
+        report = probe.diagnose(model) if probe is not None else ""
+        if not report:
+            raise
+        raise AssertionError(f"{e}\n{report}") from None
+    if probe is not None and probe.due(cycle):
+        probe.check(model, cycle)
+
+
+async def run_lockstep(dut, program, model=None, probe=None, window=None, coverage=None, trace=None):
+    """Drive ``program`` one instruction per clock, checking ``uo_out`` against ``model``.
+
+    ``program`` is any iterable of ``(ui_in, uio_in)`` pairs. Inputs are
+    applied on the falling edge so the DUT samples them on the next rising
+    edge; ``uo_out`` is checked on the following falling edge. An optional
+    probe.Probe samples internal state as configured, an optional
+    waves.WaveWindow dumps the cycles leading up to a failure, an
+    optional func_coverage.Coverage counts every executed instruction and
+    an optional cycle_trace.TraceWriter records every cycle. Returns the
+    number of instructions executed.
+    """
+    if model is None:
+        model = CPUModel()
+    driver = PinDriver(dut)
+
+    profile = profiling.active
+    expected = model.data_out
+    cycle = 0
+    executed = None
+    try:
+        if profile is not None:
+            profile.enter("stimulus")
+        for ui, uio in program:
+            if profile is not None:
+                profile.enter("drive")
+            actual = await driver.cycle(ui, uio)
+            if profile is not None:
+                profile.enter("check")
+            if trace is not None and executed is not None:
+                trace.sample(*executed, resolve(actual))
+            if expected is not None or probe is not None:
+                _check_with_probe(resolve(actual), expected, cycle, executed, model, probe)
+            expected = model.step(ui, uio)
+            if profile is not None:
+                profile.enter("coverage")
+            if coverage is not None:
+                coverage.sample(ui, uio, model.processor_stat)
+            if window is not None:
+                window.record(ui, uio)
+            executed = (ui, uio)
+            cycle += 1
+            if profile is not None:
+                profile.enter("stimulus")
+        if profile is not None:
+            profile.enter("drive")
+            profile.cycles += cycle
+        actual = await driver.cycle(*IDLE)
+        if trace is not None and executed is not None:
+            trace.sample(*executed, resolve(actual))
+        _check_with_probe(resolve(actual), expected, cycle, executed, model, probe)
+    except AssertionError:
+        if window is not None:
+            await window.replay(dut)
+        raise
+    if profile is not None:
+        profile.enter("test")
+    return cycle
+
+
+async def run_preloaded(dut, program, model=None, probe=None, coverage=None, trace=None):
+    """Like run_lockstep, but plays ``program`` from the testbench stimulus memory.
+
+    The simulator runs each chunk on its own and the responses are checked
+    against the model afterwards, so long programs cost native simulator
+    time rather than one Python callback per cycle. A sampling probe can
+    only look at the internal state at the end of each chunk.
+    """
+    if model is None:
+        model = CPUModel()
+    driver = PinDriver(dut)
+
+    profile = profiling.active
+    cycle = 0
+    if profile is not None:
+        profile.enter("drive")
+    async for chunk, responses in driver.run_preloaded(program):
+        if profile is not None:
+            profile.enter("check")
+            profile.cycles += len(chunk)
+        if trace is not None:
+            trace.record_many(chunk, responses)
+        for inst, actual in zip(chunk, responses):
+            cycle += 1
+            check_output(actual, model.step(*inst), cycle, inst)
+            if coverage is not None:
+                coverage.sample(*inst, model.processor_stat)
+        if probe is not None and probe.sampling:
+            probe.check(model, cycle)
+        if profile is not None:
+            profile.enter("drive")
+    if profile is not None:
+        profile.enter("test")
+    return cycle
+
+
+def update_shard_report(**fields):
+    """Merge ``fields`` into the JSON report named by ``SHARD_REPORT``, if any.
+
+    run_regression.py sets ``SHARD_REPORT`` for each shard and merges the
+    reports of all shards; outside a regression this does nothing.
+    """
+    path = os.getenv("SHARD_REPORT")
+    if not path:
+        return
+    report = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            report = json.load(f)
+    for key, value in fields.items():
+        report[key] = report.get(key, 0) + value if key == "cycles" else value
+    with open(path, "w") as f:
+        json.dump(report, f)
@@ -0,0 +1,172 @@
+"""Many tt_um_8bit_cpu copies in one simulation: tb_multi.v and its lockstep driver.
+
+The design is tiny, so a test spends nearly all its time on fixed costs
+per cycle (a trigger, a few GPI reads and writes, the cocotb scheduler)
+rather than on simulating logic. tb_multi.v instantiates ``K`` copies
+with independent input buses. ``MultiDriver`` packs one instruction per
+copy into a single write per bus and unpacks all K ``uo_out`` values
+from a single read, and batch_model.BatchCPU checks them in one
+vectorized comparison, so each simulated cycle verifies K instructions.
+
+Run with ``make -B TESTBENCH=multi MULTI_K=64``. On a mismatch the
+program of the first failing copy is saved as ``multi_copy<k>.bin``, to
+replay in the single-copy testbench with test_program_file.
+"""
+
+import os
+
+import cocotb
+import numpy as np
+from cocotb.triggers import ClockCycles, FallingEdge
+
+from assembler import disassemble, save_program
+from batch_model import BatchCPU, weighted_inputs
+from driver import IDLE
+from harness import start_clock
+from stimulus import parse_weights
+
+# Cycles of stimulus drawn at a time
+BLOCK = 4096
+
+
+def pack(values):
+    """A wide bus value from a (K,) uint8 array, copy 0 in the low byte."""
+    return int.from_bytes(np.ascontiguousarray(values, dtype=np.uint8).tobytes(), "little")
+
+
+def unpack(value, k):
+    """``(values, known)`` (K,) arrays from a sampled wide bus; X/Z bits make a copy unknown."""
+    chars = np.frombuffer(value.binstr.encode("ascii"), dtype=np.uint8).reshape(k, 8)[::-1]
+    ones = chars == ord("1")
+    known = (ones | (chars == ord("0"))).all(axis=1)
+    return np.packbits(ones, axis=1)[:, 0], known
+
+
+def multi_inputs(seed, k, count, weights=None, block=BLOCK):
+    """Yield ``(ui_in, uio_in)`` blocks of shape (cycles, K) until ``count`` cycles."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, block):
+        yield weighted_inputs(rng, min(block, count - start), k, weights)
+
+
+def copy_program(seed, k, count, copy, cycles, weights=None):
+    """The first ``cycles`` instructions that copy ``copy`` ran in multi_inputs(seed, k, count), packed."""
+    columns, drawn = [], 0
+    for ui_in, uio_in in multi_inputs(seed, k, count, weights):
+        if drawn >= cycles:
+            break
+        columns.append(np.stack((ui_in[:, copy], uio_in[:, copy]), axis=1))
+        drawn += len(ui_in)
+    return np.concatenate(columns)[:cycles].tobytes()
+
+
+class MultiMismatch(AssertionError):
+    """``uo_out`` of some copies disagreed with the model after ``cycle``."""
+
+    def __init__(self, message, cycle, copies):
+        super().__init__(message)
+        self.cycle = cycle
+        self.copies = copies
+
+
+class MultiDriver:
+    """Drive and sample the wide buses of tb_multi through cached handles."""
+
+    def __init__(self, dut):
+        self.k = len(dut.uo_out) // 8
+        self._ui_in = dut.ui_in
+        self._uio_in = dut.uio_in
+        self._uo_out = dut.uo_out
+        self._falling = FallingEdge(dut.clk)
+        self.idle = tuple(pack(np.full(self.k, value, dtype=np.uint8)) for value in IDLE)
+
+    async def cycle(self, ui_in, uio_in):
+        """Wait for the falling edge, sample every ``uo_out`` and apply the next (K,) inputs."""
+        await self._falling
+        value = self._uo_out.value
+        self._ui_in.setimmediatevalue(pack(ui_in))
+        self._uio_in.setimmediatevalue(pack(uio_in))
+        return unpack(value, self.k)
+
+    async def idle_cycle(self):
+        await self._falling
+        value = self._uo_out.value
+        self._ui_in.setimmediatevalue(self.idle[0])
+        self._uio_in.setimmediatevalue(self.idle[1])
+        return unpack(value, self.k)
+
+
+async def reset_multi(dut, cycles=5):
+    """Start the clock and reset every copy with the inputs idle."""
+    start_clock(dut)
+    driver = MultiDriver(dut)
+    dut.ena.value = 1
+    dut.ui_in.value, dut.uio_in.value = driver.idle
+    dut.rst_n.value = 0
+    await ClockCycles(dut.clk, cycles)
+    dut.rst_n.value = 1
+    await ClockCycles(dut.clk, cycles)
+
+
+def _check(actual, actual_known, expected, known, cycle, executed):
+    bad = known & (~actual_known | (actual != expected))
+    if not bad.any():
+        return
+    copies = np.flatnonzero(bad).tolist()
+    lines = [f"uo_out mismatch after cycle {cycle} in {len(copies)} of {len(bad)} copies"]
+    for copy in copies[:8]:
+        inst = f" ({disassemble(int(executed[0][copy]), int(executed[1][copy]))})" if executed else ""
+        found = f"0x{actual[copy]:02X}" if actual_known[copy] else "X"
+        lines.append(f"  copy {copy}{inst}: expected 0x{expected[copy]:02X}, found {found}")
+    raise MultiMismatch("\n".join(lines), cycle, copies)
+
+
+async def run_multi(dut, blocks, model=None):
+    """Drive (cycles, K) input blocks, one row per clock, checking all K ``uo_out`` every cycle.
+
+    Like harness.run_lockstep, ``uo_out`` sampled after cycle N is the
+    result of instruction N-1. Raises MultiMismatch naming the failing
+    copies; returns the number of cycles, each of which ran K instructions.
+    """
+    driver = MultiDriver(dut)
+    model = BatchCPU(driver.k) if model is None else model
+    expected, known = model.data_out, model.out_known
+    cycle = 0
+    executed = None
+    for ui_in, uio_in in blocks:
+        if ui_in.shape[1] != driver.k:
+            raise ValueError(f"stimulus for {ui_in.shape[1]} copies, the testbench has {driver.k}")
+        for inst in zip(ui_in, uio_in):
+            actual, actual_known = await driver.cycle(*inst)
+            _check(actual, actual_known, expected, known, cycle, executed)
+            expected, known = model.step(*inst)
+            executed = inst
+            cycle += 1
+    actual, actual_known = await driver.idle_cycle()
+    _check(actual, actual_known, expected, known, cycle, executed)
+    return cycle
+
+
+@cocotb.test()
+async def test_multi_random(dut):
+    # Independent random programs on every copy, checked together once per cycle.
+    # STIM_CYCLES, STIM_WEIGHTS and RANDOM_SEED as in test_random_lockstep; make MULTI_K sets the copies.
+    seed = cocotb.RANDOM_SEED
+    count = int(os.getenv("STIM_CYCLES", "2000"))
+    weights = parse_weights(os.getenv("STIM_WEIGHTS", ""))
+    k = len(dut.uo_out) // 8
+    cocotb.log.info(f"{k} copies, random stimulus seed {seed}, {count} cycles")
+
+    await reset_multi(dut)
+    try:
+        cycles = await run_multi(dut, multi_inputs(seed, k, count, weights))
+    except MultiMismatch as e:
+        if not e.cycle:
+            raise
+        copy = e.copies[0]
+        path = os.path.abspath(f"multi_copy{copy}.bin")
+        save_program(path, copy_program(seed, k, count, copy, e.cycle, weights))
+        raise MultiMismatch(f"{e}\nreplay copy {copy}: make -B TESTCASE=test_program_file PROGRAM={path}",
+                            e.cycle, e.copies) from None
+
+    cocotb.log.info(f"{k * cycles} random instructions verified on {k} copies in {cycles} cycles (seed {seed}).")
@@ -0,0 +1,91 @@
+"""Sampled probing of tt_um_8bit_cpu internals.
+
+Checking ``uo_out`` against the reference model is enough to catch most
+bugs, and hierarchical reads are comparatively expensive in Icarus and
+simply do not exist in a gate-level netlist. A ``Probe`` therefore checks
+the architectural state inside the design (``RF1.reg_data``,
+``processor_stat``) only:
+
+* every ``PROBE_RATE`` cycles in ``sampled`` mode, or every cycle in ``full`` mode,
+* right after a port mismatch, to add the internal state to the report.
+
+``PROBE=ports`` (the default) does the latter only. When the internal
+handles cannot be found, as in a ``GATES=yes`` run, the probe disables
+itself and the same test checks ports only.
+"""
+
+import os
+
+import cocotb
+
+from cpu_model import REG_COUNT, matches
+from driver import resolve
+
+MODES = ("ports", "sampled", "full")
+
+
+class Probe:
+    """Reads internal state of ``dut.myCPU`` on demand and compares it to a CPUModel."""
+
+    def __init__(self, dut, mode=None, rate=None):
+        self.mode = mode or os.getenv("PROBE", "ports")
+        if self.mode not in MODES:
+            raise ValueError(f"PROBE must be one of {', '.join(MODES)}, not {self.mode!r}")
+        self.rate = 1 if self.mode == "full" else int(rate or os.getenv("PROBE_RATE", "1000"))
+        self.reads = 0
+        self._regs = self._stat = None
+
+        if os.getenv("GATES") == "yes":
+            self.available = False
+        else:
+            try:
+                cpu = dut.myCPU
+                self._regs = [cpu.RF1.reg_data[i] for i in range(REG_COUNT)]
+                self._stat = cpu.processor_stat
+                self.available = True
+            except (AttributeError, IndexError):
+                self.available = False
+        if not self.available and self.mode != "ports":
+            cocotb.log.info("Internal signals not available (gate level?), probing ports only")
+        self.sampling = self.available and self.mode != "ports"
+
+    def due(self, cycle):
+        """True if internals should be checked on this cycle."""
+        return self.sampling and cycle % self.rate == 0
+
+    def read(self):
+        """Return ``(regs, processor_stat)`` from the design, with ``None`` for X."""
+        self.reads += 1
+        regs = [resolve(handle.value) for handle in self._regs]
+        return regs, resolve(self._stat.value)
+
+    def differences(self, model):
+        """List of human-readable differences between the design and ``model``."""
+        regs, stat = self.read()
+        diffs = [
+            f"r{i}: expected {_fmt(want)}, found {_fmt(got)}"
+            for i, (want, got) in enumerate(zip(model.regs, regs))
+            if not matches(want, got)
+        ]
+        if not matches(model.processor_stat, stat):
+            diffs.append(f"processor_stat: expected {model.processor_stat}, found {_fmt(stat)}")
+        return diffs
+
+    def check(self, model, cycle):
+        """Raise AssertionError if the internal state disagrees with ``model``."""
+        diffs = self.differences(model)
+        if diffs:
+            raise AssertionError(f"internal state mismatch after cycle {cycle}:\n  " + "\n  ".join(diffs))
+
+    def diagnose(self, model):
+        """Internal-state report to attach to a port mismatch ("" if unavailable)."""
+        if not self.available:
+            return ""
+        diffs = self.differences(model)
+        if not diffs:
+            return "internal state matches the model"
+        return "internal state differs from the model:\n  " + "\n  ".join(diffs)
+
+
+def _fmt(value):
+    return "X" if value is None else f"0x{value:02X}"
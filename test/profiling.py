@@ -0,0 +1,234 @@
+"""Per-phase profiling of the cocotb tests, to see where a slow regression spends its time.
+
+With ``PROFILE=1`` every test in a module passed to ``instrument`` runs
+under a ``Profiler``, which splits the wall time of the test into phases:
+
+* ``stimulus``, ``drive``, ``check``, ``coverage``: the parts of each
+  cycle in harness.run_lockstep and run_preloaded,
+* ``await RisingEdge(clk)``, ``await ClockCycles(clk)``...: waiting for a
+  trigger, i.e. the simulator and every other coroutine (the clock),
+* ``signal access``: reading and writing handles, through the ``dut``
+  proxy the test receives instead of the real one,
+* ``test``: everything else the test does.
+
+Time is charged to one phase at a time, so the phases add up to the wall
+time. The proxy also counts reads and writes per hierarchy path. At the
+end of each test the report goes to the log and, with
+``PROFILE_FILE=<path>.json``, into that file under the test name.
+
+Without ``PROFILE=1`` nothing is wrapped or patched; the harness only
+checks once per phase that no profiler is active.
+"""
+
+import functools
+import json
+import os
+import time
+from collections import Counter, defaultdict
+
+import cocotb
+import cocotb.decorators
+from cocotb.triggers import ClockCycles, Edge, FallingEdge, RisingEdge
+
+AWAIT = "await "
+
+# The Profiler of the running test, or None
+active = None
+
+
+class Profiler:
+    """Wall time per phase, entries per phase and signal accesses per path for one test."""
+
+    def __init__(self, name):
+        self.name = name
+        self.times = defaultdict(float)
+        self.entries = Counter()
+        self.reads = Counter()
+        self.writes = Counter()
+        self.cycles = 0
+        self.wall = None
+        self.phase = "test"
+        self._start = self._since = time.perf_counter()
+
+    def enter(self, phase):
+        """Charge the time since the last switch to the current phase and switch to ``phase``.
+
+        Returns the phase left, to switch back to.
+        """
+        previous = self.resume(phase)
+        self.entries[phase] += 1
+        return previous
+
+    def resume(self, phase):
+        """Like ``enter``, but going back to ``phase`` after a nested one does not count as an entry."""
+        now = time.perf_counter()
+        self.times[self.phase] += now - self._since
+        self._since = now
+        previous, self.phase = self.phase, phase
+        return previous
+
+    def finish(self):
+        self.enter("test")
+        self.wall = self._since - self._start
+
+    def to_dict(self):
+        return {
+            "wall": self.wall,
+            "cycles": self.cycles,
+            "phases": {phase: {"time": t, "entries": self.entries[phase]} for phase, t in self.times.items()},
+            "reads": dict(self.reads),
+            "writes": dict(self.writes),
+        }
+
+    def report(self):
+        wall = self.wall if self.wall is not None else time.perf_counter() - self._start
+        cycles = f", {self.cycles} cycles ({wall / self.cycles * 1e6:.2f} us/cycle)" if self.cycles else ""
+        lines = [f"profile of {self.name}: {wall:.3f} s{cycles}",
+                 f"  {'phase':<28} {'time (s)':>9} {'%':>6} {'us/cycle':>9} {'entries':>9}"]
+        for phase, t in sorted(self.times.items(), key=lambda item: -item[1]):
+            per_cycle = f"{t / self.cycles * 1e6:9.2f}" if self.cycles else f"{'-':>9}"
+            lines.append(f"  {phase:<28} {t:9.3f} {100 * t / wall if wall else 0:6.1f} {per_cycle} "
+                         f"{self.entries[phase]:9d}")
+        paths = sorted(set(self.reads) | set(self.writes), key=lambda p: -(self.reads[p] + self.writes[p]))
+        if paths:
+            lines.append(f"  {'signal':<28} {'reads':>9} {'writes':>9}")
+            lines.extend(f"  {path:<28} {self.reads[path]:9d} {self.writes[path]:9d}" for path in paths)
+        return "\n".join(lines)
+
+    def export(self, path=None):
+        """Add this profile to the JSON file ``path`` (default ``PROFILE_FILE``), keyed by test name."""
+        path = path or os.getenv("PROFILE_FILE")
+        if not path:
+            return
+        profiles = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                profiles = json.load(f)
+        profiles[self.name] = self.to_dict()
+        with open(path, "w") as f:
+            json.dump(profiles, f, indent=2)
+
+
+class ProfiledHandle:
+    """Stands in for a cocotb handle, counting and timing ``value`` reads and writes.
+
+    Children are wrapped on first access and cached, so a handle is the same
+    object every time and can be passed to triggers and Clock as usual.
+    """
+
+    def __init__(self, target, profiler):
+        self._target = target
+        self._profiler = profiler
+        self._children = {}
+
+    def _wrap(self, key, child):
+        if hasattr(child, "_path"):
+            child = ProfiledHandle(child, self._profiler)
+        self._children[key] = child
+        return child
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            return getattr(self._target, name)
+        child = self._children.get(name)
+        return child if child is not None else self._wrap(name, getattr(self._target, name))
+
+    def __getitem__(self, index):
+        child = self._children.get(index)
+        return child if child is not None else self._wrap(index, self._target[index])
+
+    def __len__(self):
+        return len(self._target)
+
+    @property
+    def value(self):
+        profiler = self._profiler
+        previous = profiler.enter("signal access")
+        value = self._target.value
+        profiler.resume(previous)
+        profiler.reads[self._target._path] += 1
+        return value
+
+    @value.setter
+    def value(self, value):
+        profiler = self._profiler
+        previous = profiler.enter("signal access")
+        self._target.value = value
+        profiler.resume(previous)
+        profiler.writes[self._target._path] += 1
+
+    def setimmediatevalue(self, value):
+        profiler = self._profiler
+        previous = profiler.enter("signal access")
+        self._target.setimmediatevalue(value)
+        profiler.resume(previous)
+        profiler.writes[self._target._path] += 1
+
+    def __repr__(self):
+        return repr(self._target)
+
+
+def _describe(trigger):
+    signal = getattr(trigger, "signal", None)
+    name = getattr(signal, "_name", None)
+    return f"{AWAIT}{type(trigger).__name__}({name})" if name else f"{AWAIT}{type(trigger).__name__}"
+
+
+def _timed(original):
+    def __await__(self):
+        profiler = active
+        # Time nested awaits (the edges inside ClockCycles) as the outer one
+        if profiler is None or profiler.phase.startswith(AWAIT):
+            return (yield from original(self))
+        previous = profiler.enter(_describe(self))
+        try:
+            return (yield from original(self))
+        finally:
+            profiler.resume(previous)
+    return __await__
+
+
+_HOOKED = (RisingEdge, FallingEdge, Edge, ClockCycles)
+_saved = {}
+
+
+def _install_hooks():
+    for cls in _HOOKED:
+        if cls not in _saved:
+            _saved[cls] = vars(cls).get("__await__")
+            cls.__await__ = _timed(cls.__await__)
+
+
+def _remove_hooks():
+    for cls, original in _saved.items():
+        if original is None:
+            del cls.__await__
+        else:
+            cls.__await__ = original
+    _saved.clear()
+
+
+def _profiled(func, name):
+    @functools.wraps(func)
+    async def run(dut, *args, **kwargs):
+        global active
+        profiler = active = Profiler(name)
+        _install_hooks()
+        try:
+            return await func(ProfiledHandle(dut, profiler), *args, **kwargs)
+        finally:
+            active = None
+            _remove_hooks()
+            profiler.finish()
+            cocotb.log.info(profiler.report())
+            profiler.export()
+    return run
+
+
+def instrument(namespace):
+    """Profile every cocotb test defined in ``namespace`` (a module's ``globals()``) if ``PROFILE=1``."""
+    if os.getenv("PROFILE") != "1":
+        return
+    for obj in list(namespace.values()):
+        if isinstance(obj, cocotb.decorators.test) and not hasattr(obj._func, "__wrapped__"):
+            obj._func = _profiled(obj._func, obj.name)
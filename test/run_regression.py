@@ -0,0 +1,201 @@
+"""Run a random-program regression as parallel, seed-sharded simulator jobs.
+
+Each shard is an independent ``make`` run of this directory's Makefile
+with its own seed and work directory, so one simulator process runs per
+core. The design is compiled once through build_cache.py and every shard
+loads the same image; with ``--no-cache`` each shard compiles into its
+own ``SIM_BUILD`` instead. Shard seeds are derived deterministically from the
+base seed and the shard index; a failing shard is rerun on its own with
+``--shard N`` and the same ``--seed``. Functional coverage from every
+shard is merged into the report; ``--patience`` ends each shard early once
+its coverage stops growing.
+
+Usage::
+
+    python run_regression.py --shards 32 --cycles 100000 --seed 1
+    python run_regression.py --shards 32 --cycles 100000 --seed 1 --shard 7
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import build_cache
+from func_coverage import format_summary, merge_files
+from waves import compress_vcd
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def shard_seed(base_seed, index):
+    """Seed for shard ``index``; stable across runs, machines and Python versions."""
+    return zlib.crc32(f"{base_seed}/{index}".encode())
+
+
+def parse_results(path):
+    """Read a cocotb results.xml into a list of per-test dicts."""
+    tests = []
+    if not os.path.exists(path):
+        return tests
+    for case in ET.parse(path).iter("testcase"):
+        tests.append({
+            "name": case.get("name"),
+            "passed": case.find("failure") is None and case.find("error") is None,
+            "skipped": case.find("skipped") is not None,
+            "time": float(case.get("time", 0)),
+            "sim_time_ns": float(case.get("sim_time_ns", 0)),
+        })
+    return tests
+
+
+def make_vars(args):
+    return ["GATES=yes"] if args.gates else []
+
+
+def make_command(args, workdir):
+    """``make`` invocation for one shard, run from its work directory."""
+    sim_build = args.sim_build or os.path.join(workdir, "sim_build")
+    return ["make", "-f", os.path.join(TEST_DIR, "Makefile"), f"PWD={TEST_DIR}",
+            f"SIM_BUILD={sim_build}",
+            f"COCOTB_RESULTS_FILE={os.path.join(workdir, 'results.xml')}",
+            f"TESTCASE={args.testcase}", *make_vars(args)]
+
+
+def run_testcase(testcase, workdir, env=None, make_vars=(), log=sys.stderr):
+    """Run one cocotb test from the build cache in ``workdir``; returns its non-skipped results.
+
+    ``env`` adds environment variables; output goes to ``workdir/sim.log``.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    results = os.path.join(workdir, "results.xml")
+    if os.path.exists(results):
+        os.remove(results)
+    run_env = dict(os.environ, **(env or {}))
+    run_env["PYTHONPATH"] = os.pathsep.join(filter(None, [TEST_DIR, run_env.get("PYTHONPATH")]))
+    sim_build = build_cache.ensure_built(make_vars, log)
+    with open(os.path.join(workdir, "sim.log"), "w") as sim_log:
+        subprocess.call(["make", "-f", os.path.join(TEST_DIR, "Makefile"), f"PWD={TEST_DIR}",
+                         f"SIM_BUILD={sim_build}", f"COCOTB_RESULTS_FILE={results}",
+                         f"TESTCASE={testcase}", *make_vars],
+                        cwd=workdir, env=run_env, stdout=sim_log, stderr=subprocess.STDOUT)
+    tests = [t for t in parse_results(results) if not t["skipped"]]
+    if not tests:
+        raise RuntimeError(f"{testcase} did not run, see {os.path.join(workdir, 'sim.log')}")
+    return tests
+
+
+def run_shard(args, index):
+    """Run one shard to completion and return its report."""
+    seed = shard_seed(args.seed, index)
+    workdir = os.path.join(args.outdir, f"shard_{index:04d}")
+    os.makedirs(workdir, exist_ok=True)
+    report_file = os.path.join(workdir, "shard.json")
+    coverage_file = os.path.join(workdir, "coverage.npz")
+    for stale in (report_file, coverage_file):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    env = dict(os.environ)
+    # The Makefile locates sources through $(PWD); cocotb imports test.py from PYTHONPATH
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [TEST_DIR, env.get("PYTHONPATH")]))
+    env["RANDOM_SEED"] = str(seed)
+    env["STIM_CYCLES"] = str(args.cycles)
+    env["SHARD_REPORT"] = report_file
+    env["COVERAGE_FILE"] = coverage_file
+    if args.patience:
+        env["COVERAGE_PATIENCE"] = str(args.patience)
+
+    start = time.monotonic()
+    with open(os.path.join(workdir, "sim.log"), "w") as log:
+        returncode = subprocess.call(make_command(args, workdir), cwd=workdir, env=env,
+                                     stdout=log, stderr=subprocess.STDOUT)
+    wall = time.monotonic() - start
+
+    vcd = os.path.join(workdir, "tb.vcd")
+    if args.gzip_waves and os.path.exists(vcd):
+        compress_vcd(vcd)
+
+    tests = parse_results(os.path.join(workdir, "results.xml"))
+    extra = {}
+    if os.path.exists(report_file):
+        with open(report_file) as f:
+            extra = json.load(f)
+    ran = [t for t in tests if not t["skipped"]]
+    return {
+        "shard": index,
+        "seed": seed,
+        "workdir": workdir,
+        "passed": returncode == 0 and bool(ran) and all(t["passed"] for t in ran),
+        "wall_time": wall,
+        "tests": tests,
+        **extra,
+    }
+
+
+def merge(reports):
+    """Combine shard reports into one regression summary."""
+    failed = [r for r in reports if not r["passed"]]
+    cycles = sum(r.get("cycles", 0) for r in reports)
+    wall = sum(r["wall_time"] for r in reports)
+    return {
+        "shards": len(reports),
+        "passed": len(reports) - len(failed),
+        "failed": [{"shard": r["shard"], "seed": r["seed"], "log": os.path.join(r["workdir"], "sim.log")}
+                   for r in failed],
+        "cycles": cycles,
+        "cpu_wall_time": wall,
+        "cycles_per_second": cycles / wall if wall else 0.0,
+        "reports": sorted(reports, key=lambda r: r["shard"]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed-sharded parallel regression runner")
+    parser.add_argument("--shards", type=int, default=os.cpu_count(), help="number of shards")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="simulators to run at once")
+    parser.add_argument("--seed", type=int, default=1, help="base seed the shard seeds derive from")
+    parser.add_argument("--cycles", type=int, default=100000, help="random instructions per shard")
+    parser.add_argument("--shard", type=int, action="append", help="run only this shard (repeatable)")
+    parser.add_argument("--testcase", default="test_random_lockstep")
+    parser.add_argument("--gates", action="store_true", help="run against the gate-level netlist")
+    parser.add_argument("--no-cache", action="store_true", help="compile per shard instead of once")
+    parser.add_argument("--gzip-waves", action="store_true", help="gzip each shard's tb.vcd")
+    parser.add_argument("--patience", type=int, default=0,
+                        help="end a shard after this many cycles without new coverage")
+    parser.add_argument("--outdir", default=os.path.join(TEST_DIR, "sim_build", "regression"))
+    args = parser.parse_args(argv)
+    args.outdir = os.path.abspath(args.outdir)
+
+    indices = args.shard if args.shard else range(args.shards)
+    start = time.monotonic()
+    args.sim_build = None if args.no_cache else build_cache.ensure_built(make_vars(args))
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        reports = list(pool.map(lambda index: run_shard(args, index), indices))
+    summary = merge(reports)
+    summary["wall_time"] = time.monotonic() - start
+    coverage_files = [os.path.join(r["workdir"], "coverage.npz") for r in reports]
+    coverage = merge_files([path for path in coverage_files if os.path.exists(path)])
+    summary["coverage"] = coverage.summary()
+
+    os.makedirs(args.outdir, exist_ok=True)
+    coverage.save(os.path.join(args.outdir, "coverage.npz"))
+    with open(os.path.join(args.outdir, "report.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"{summary['passed']}/{summary['shards']} shards passed, {summary['cycles']} cycles "
+          f"in {summary['wall_time']:.1f}s ({summary['cycles_per_second']:.0f} cycles/s per simulator)")
+    print(format_summary(summary["coverage"]))
+    for fail in summary["failed"]:
+        print(f"FAILED shard {fail['shard']} (seed {fail['seed']}): rerun with "
+              f"--seed {args.seed} --cycles {args.cycles} --shard {fail['shard']}; log {fail['log']}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""Shrink a failing program to a short reproducer.
+
+A failure found by a long random run is reduced with the reference model,
+without the simulator in the loop:
+
+1. everything after the instruction whose ``uo_out`` mismatched is dropped;
+2. the model computes the dynamic backward slice of that instruction: the
+   instructions that produced the registers, carry and ``data_out`` it
+   observed, transitively;
+3. operands that read r14 or r15 (X, past ``REG_COUNT``) are pointed at
+   r0. The model turns anything computed from X into X (the constant carry
+   of the logic ops aside), so a checked ``uo_out`` never depends on an X
+   value and the reproducer should not read one;
+4. delta debugging (ddmin) removes what else it can. A candidate is kept
+   when the model shows every kept instruction still reading the same
+   operand values (any value where the original read X), none of them
+   reading X, and the failing cycle still expecting the same ``uo_out``.
+   The candidates of each round are tried in parallel processes.
+
+The model is correct by construction, so it cannot tell whether the DUT
+still fails. The result is confirmed with one short cocotb run of
+test_program_file. If that run passes (the bug depends on state outside
+the slice), the reproducer falls back to restoring the model state followed
+by the last ``--window`` instructions, and that is confirmed instead.
+
+The reproducer is saved as a packed program and printed as a test in the
+style of test.py.
+
+Usage::
+
+    python shrink.py --seed 1234 --cycles 100000 --log sim_build/regression/shard_0007/sim.log
+    python shrink.py --program prog.bin --fail-cycle 5321
+"""
+
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from assembler import assemble_line, disassemble, encode, load_program, pairs, save_program
+from cpu_model import MNEMONICS, OPERANDS, RDS, REG_COUNT, STB, CPUModel, decode
+from run_regression import run_testcase
+from stimulus import instruction_stream, parse_weights
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_MISMATCH = re.compile(r"uo_out mismatch after cycle (\d+)")
+
+
+def failing_cycle(log_path):
+    """The cycle of the first ``uo_out`` mismatch reported in a simulator log."""
+    with open(log_path, errors="replace") as f:
+        match = _MISMATCH.search(f.read())
+    if not match:
+        raise ValueError(f"{log_path}: no uo_out mismatch found")
+    return int(match.group(1))
+
+
+def _observed(model, inst, fields):
+    """The state instruction ``inst`` reads: its source registers, and the carry for RDS."""
+    operands = OPERANDS.get(inst)
+    values = () if operands is None else tuple(
+        model.read(fields[field]) for field in operands[:2] if field is not None)
+    return values + (model.processor_stat,) if inst == RDS else values
+
+
+def _x_fields(inst, fields):
+    """The operand fields ``inst`` reads registers past ``REG_COUNT`` (X) through."""
+    operands = OPERANDS.get(inst, (None, None, None))
+    return [field for field in operands[:2] if field is not None and fields[field] >= REG_COUNT]
+
+
+def reads_x(ui_in, uio_in):
+    return bool(_x_fields(*decode(ui_in, uio_in)))
+
+
+def known_reads(ui_in, uio_in):
+    """The instruction with every operand that reads X pointed at r0 instead."""
+    inst, fields = decode(ui_in, uio_in)
+    x_fields = _x_fields(inst, fields)
+    if not x_fields:
+        return ui_in, uio_in
+    fields = [0 if field in x_fields else reg for field, reg in enumerate(fields)]
+    return inst << 4 | fields[0], fields[1] << 4 | fields[2]
+
+
+def backward_slice(program):
+    """Indices of the instructions the last one of ``program`` depends on, itself included.
+
+    Also returns what each of those instructions reads and the ``uo_out``
+    expected after the last one. A value that was X when read does not
+    matter, so whatever produced it is not part of the slice.
+    """
+    model = CPUModel()
+    reg_writer = [None] * REG_COUNT
+    carry_writer = out_writer = None
+    deps, inputs = [], []
+    for index, (ui, uio) in enumerate(program):
+        inst, fields = decode(ui, uio)
+        operands = OPERANDS.get(inst, (None, None, None))
+        sources = [fields[field] for field in operands[:2] if field is not None]
+        deps.append([reg_writer[reg] for reg in sources if model.read(reg) is not None]
+                    + ([carry_writer] if inst == RDS and model.processor_stat is not None else []))
+        inputs.append(_observed(model, inst, fields))
+        model.step(ui, uio)
+
+        last_out_writer = out_writer
+        if operands[2] is not None and fields[operands[2]] < REG_COUNT:
+            reg_writer[fields[operands[2]]] = index
+        if inst >= 0b1000 and inst in MNEMONICS:
+            carry_writer = index
+        if inst in (STB, RDS):
+            out_writer = index
+
+    # Anything but STB/RDS shows the data_out of the previous one
+    last = len(program) - 1
+    deps[last].append(last_out_writer)
+
+    keep, stack = {last}, [last]
+    while stack:
+        for dep in deps[stack.pop()]:
+            if dep is not None and dep not in keep:
+                keep.add(dep)
+                stack.append(dep)
+    indices = sorted(keep)
+    return indices, {i: inputs[i] for i in indices}, model.data_out
+
+
+_job = None
+
+
+def _init(program, inputs, expected):
+    global _job
+    _job = (program, inputs, expected)
+
+
+def _same_inputs(observed, original):
+    return len(observed) == len(original) and all(
+        value is None or value == seen for value, seen in zip(original, observed))
+
+
+def _interesting(indices):
+    """True when running ``indices`` keeps every input and the final expected ``uo_out``.
+
+    Candidates that read X are rejected, unless the expected ``uo_out``
+    is X itself, the only case where the failure can depend on an X value.
+    """
+    program, inputs, expected = _job
+    model = CPUModel()
+    for index in indices:
+        ui, uio = program[index]
+        inst, fields = decode(ui, uio)
+        if expected is not None and _x_fields(inst, fields):
+            return False
+        if not _same_inputs(_observed(model, inst, fields), inputs[index]):
+            return False
+        out = model.step(ui, uio)
+    return out == expected
+
+
+def ddmin(program, inputs, expected, jobs=None):
+    """Minimise ``program`` (its last instruction always kept) under _interesting.
+
+    ``inputs`` maps each index of ``program`` to what it reads in the
+    original run; ``program`` should already read no X (see known_reads).
+    Returns the kept indices.
+    """
+    last = len(program) - 1
+    items = list(range(last))
+    args = (program, inputs, expected)
+    if jobs == 1:
+        _init(*args)
+        pool, run = None, map
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init, initargs=args)
+        run = pool.map
+    try:
+        n = 2
+        while len(items) >= 2:
+            size = -(-len(items) // n)
+            chunks = [items[i:i + size] for i in range(0, len(items), size)]
+            complements = [items[:i] + items[i + size:] for i in range(0, len(items), size)]
+            candidates = chunks + complements if n > 2 else chunks
+            results = list(run(_interesting, [c + [last] for c in candidates]))
+            if any(results):
+                found = results.index(True)
+                items = candidates[found]
+                n = 2 if found < len(chunks) else max(n - 1, 2)
+            elif n >= len(items):
+                break
+            else:
+                n = min(2 * n, len(items))
+        if len(items) == 1 and next(iter(run(_interesting, [[last]]))):
+            items = []
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return items + [last]
+
+
+def window_program(program, window):
+    """State restore from the model, then the last ``window`` instructions of ``program``."""
+    start = max(len(program) - window, 0)
+    model = CPUModel()
+    model.run(program[:start])
+    return model.restore_program() + list(program[start:])
+
+
+def shrink(program, jobs=None, log=sys.stderr):
+    """Shrink ``program``, whose last instruction is the one that fails; returns the reproducer."""
+    indices, inputs, expected = backward_slice(program)
+    print(f"slice: {len(indices)} of {len(program)} instructions", file=log)
+    sliced = [program[i] if expected is None else known_reads(*program[i]) for i in indices]
+    inputs = {position: inputs[i] for position, i in enumerate(indices)}
+    kept = ddmin(sliced, inputs, expected, jobs)
+    print(f"ddmin: {len(kept)} instructions", file=log)
+    return [sliced[i] for i in kept]
+
+
+def confirm(program, workdir, make_vars=(), log=sys.stderr):
+    """Run ``program`` through test_program_file once; True if the DUT fails it."""
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, "shrunk.bin")
+    save_program(path, program)
+    tests = run_testcase("test_program_file", workdir, {"PROGRAM": path}, make_vars, log)
+    return not all(t["passed"] for t in tests)
+
+
+def format_test(program, name, origin):
+    """``program`` as a cocotb test in the style of test.py."""
+    lines = []
+    for ui, uio in program:
+        text = disassemble(ui, uio)
+        if assemble_line(text) != (ui, uio):
+            # Fields the opcode ignores are set; keep the exact encoding
+            text = f"{f'.byte 0x{ui:02X}, 0x{uio:02X}':<19} ; {text}"
+        lines.append(f"        {text}")
+    body = "\n".join(lines)
+    return f'''@cocotb.test()
+async def test_{name}(dut):
+    # Reproducer shrunk from {origin}: uo_out mismatches after the last instruction
+    await reset_dut(dut)
+
+    program = assemble("""
+{body}
+    """)
+    cycles = await run_lockstep(dut, pairs(program), probe=Probe(dut))
+
+    cocotb.log.info(f"{{cycles}} instructions verified against the reference model.")
+'''
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shrink a failing program to a short reproducer")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--program", help="packed program that fails")
+    source.add_argument("--seed", type=int, help="RANDOM_SEED of a failing test_random_lockstep run")
+    parser.add_argument("--cycles", type=int, default=2000, help="STIM_CYCLES of that run")
+    parser.add_argument("--weights", default="", help="STIM_WEIGHTS of that run")
+    failure = parser.add_mutually_exclusive_group(required=True)
+    failure.add_argument("--fail-cycle", type=int, help="cycle of the uo_out mismatch")
+    failure.add_argument("--log", help="simulator log to read the mismatch cycle from")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="processes for ddmin")
+    parser.add_argument("--window", type=int, default=64, help="fallback window if the slice does not fail")
+    parser.add_argument("--no-confirm", action="store_true", help="skip the cocotb confirmation run")
+    parser.add_argument("--gates", action="store_true", help="confirm against the gate-level netlist")
+    parser.add_argument("--name", default=None, help="name of the emitted test")
+    parser.add_argument("--outdir", default=os.path.join(TEST_DIR, "sim_build", "shrink"))
+    args = parser.parse_args(argv)
+
+    cycle = args.fail_cycle if args.log is None else failing_cycle(args.log)
+    if cycle < 1:
+        parser.error("the mismatch must be after at least one instruction")
+    # The check after cycle N covers instruction N-1, so the first N instructions reproduce it
+    if args.program:
+        program = list(islice(pairs(load_program(args.program)), cycle))
+        origin = f"{os.path.basename(args.program)}, cycle {cycle}"
+    else:
+        stream = instruction_stream(args.seed, parse_weights(args.weights), args.cycles)
+        program = list(islice(stream, cycle))
+        origin = f"seed {args.seed}, cycle {cycle}"
+    if len(program) < cycle:
+        parser.error(f"the program has only {len(program)} instructions")
+
+    shrunk = shrink(program, args.jobs)
+    make_vars = ["GATES=yes"] if args.gates else []
+    if not args.no_confirm:
+        if not confirm(shrunk, args.outdir, make_vars):
+            print(f"the slice does not fail on the DUT; falling back to the last {args.window} cycles",
+                  file=sys.stderr)
+            shrunk = window_program(program, args.window)
+            if not confirm(shrunk, args.outdir, make_vars):
+                print("the fallback does not fail either; the failure needs more history",
+                      file=sys.stderr)
+                return 1
+        print(f"confirmed: {len(shrunk)} instructions fail on the DUT", file=sys.stderr)
+    else:
+        os.makedirs(args.outdir, exist_ok=True)
+        save_program(os.path.join(args.outdir, "shrunk.bin"), encode(shrunk))
+
+    name = args.name or (f"shrunk_seed_{args.seed}" if args.seed is not None else "shrunk")
+    print(format_test(shrunk, name, origin))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
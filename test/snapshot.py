@@ -0,0 +1,137 @@
+"""Architectural state snapshots, to start tests without the reset/preload prologue.
+
+Every test used to hold ``rst_n`` low for 5 cycles, wait 5 more and seed
+registers with LDB before doing any real work. A ``Snapshot`` holds the
+whole architectural state of tt_um_8bit_cpu (``RF1.reg_data``,
+``processor_stat``, ``data_out``; the design has no other flops) and
+``restore`` puts the design in that state:
+
+* ``deposit``: write the values straight into the design, with reset
+  held off. Takes one idle cycle whatever the state.
+* ``replay``: reset, then the LDB/INC/STB sequence from
+  CPUModel.restore_program. Used at gate level, where the internal
+  names do not exist.
+
+``SNAPSHOT_RESTORE`` (``auto``, ``deposit`` or ``replay``) overrides the choice.
+"""
+
+import json
+import os
+
+import cocotb
+from cocotb.triggers import FallingEdge
+
+from cpu_model import REG_COUNT, CPUModel, matches
+from driver import IDLE, resolve
+from harness import apply_reset, run_lockstep, start_clock
+
+METHODS = ("auto", "deposit", "replay")
+
+
+def _handles(dut):
+    """``(regs, processor_stat, data_out)`` handles, or None when they do not exist."""
+    if os.getenv("GATES") == "yes":
+        return None
+    try:
+        cpu = dut.myCPU
+        return [cpu.RF1.reg_data[i] for i in range(REG_COUNT)], cpu.processor_stat, cpu.data_out
+    except (AttributeError, IndexError):
+        return None
+
+
+class Snapshot:
+    """Register file, ``processor_stat`` and ``data_out``, with ``None`` for X."""
+
+    def __init__(self, regs, processor_stat=0, data_out=0):
+        if len(regs) != REG_COUNT:
+            raise ValueError(f"a snapshot holds {REG_COUNT} registers, not {len(regs)}")
+        self.regs = list(regs)
+        self.processor_stat = processor_stat
+        self.data_out = data_out
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(model.regs, model.processor_stat, model.data_out)
+
+    @classmethod
+    def capture(cls, dut, model=None):
+        """Read the state from the design, after a falling edge.
+
+        At gate level it is taken from ``model`` instead, which lockstep
+        checking keeps equal to the design.
+        """
+        handles = _handles(dut)
+        if handles is None:
+            if model is None:
+                raise RuntimeError("internal state not available (gate level?), pass the model")
+            return cls.from_model(model)
+        regs, stat, data_out = handles
+        return cls([resolve(reg.value) for reg in regs], resolve(stat.value), resolve(data_out.value))
+
+    def model(self):
+        """A CPUModel in this state."""
+        model = CPUModel()
+        model.regs = list(self.regs)
+        model.processor_stat = self.processor_stat
+        model.data_out = self.data_out
+        return model
+
+    def program(self):
+        """Instructions that take a freshly reset CPU to this state."""
+        return self.model().restore_program()
+
+    def to_dict(self):
+        return {"regs": self.regs, "processor_stat": self.processor_stat, "data_out": self.data_out}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["regs"], data["processor_stat"], data["data_out"])
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+async def restore(dut, snapshot, method=None):
+    """Put the running design in ``snapshot``'s state; returns a CPUModel to check against.
+
+    The clock must already be running (start_clock or reset_dut).
+    """
+    method = method or os.getenv("SNAPSHOT_RESTORE", "auto")
+    if method not in METHODS:
+        raise ValueError(f"SNAPSHOT_RESTORE must be one of {', '.join(METHODS)}, not {method!r}")
+    handles = _handles(dut) if method != "replay" else None
+    if handles is None:
+        if method == "deposit":
+            raise RuntimeError("cannot deposit: internal state not available (gate level?)")
+        await apply_reset(dut)
+        await run_lockstep(dut, snapshot.program())
+        return snapshot.model()
+
+    # Idle inputs and no reset: the next rising edge keeps whatever is deposited
+    dut.ena.value = 1
+    dut.ui_in.value, dut.uio_in.value = IDLE
+    dut.rst_n.value = 1
+    await FallingEdge(dut.clk)
+    regs, stat, data_out = handles
+    values = [*zip(regs, snapshot.regs), (stat, snapshot.processor_stat), (data_out, snapshot.data_out)]
+    for handle, value in values:
+        if value is not None:   # X stays whatever it is, the model does not care
+            handle.setimmediatevalue(value)
+    await FallingEdge(dut.clk)
+    for handle, value in values:
+        if not matches(value, resolve(handle.value)):
+            raise RuntimeError(f"deposit into {handle._path} did not stick")
+    cocotb.log.debug("state restored by deposit")
+    return snapshot.model()
+
+
+async def start_from(dut, snapshot, method=None):
+    """Start a test in ``snapshot``'s state, instead of reset_dut and an LDB prologue."""
+    start_clock(dut)
+    return await restore(dut, snapshot, method)
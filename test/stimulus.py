@@ -0,0 +1,189 @@
+"""Constrained-random instruction streams for tt_um_8bit_cpu.
+
+``instruction_stream`` lazily yields encoded ``(ui_in, uio_in)`` pairs, so
+a cocotb driver can consume it one pair per clock and memory stays flat
+regardless of run length. Opcodes are drawn with per-opcode weights that
+include the NOP slots (0100-0111, 1111); register fields occasionally
+select the out-of-range indices 14/15.
+
+Streams are fully determined by their seed, so a failing run is replayed
+by passing the same seed (``RANDOM_SEED=<seed>`` for the cocotb tests).
+
+``directed_stream`` closes coverage holes faster: it reads the holes of a
+func_coverage.Coverage that the harness is filling while the stream runs,
+and mixes short sequences synthesized for a hole (e.g. set the carry, load
+operands, then the ALU op that keeps or clears it) with random
+instructions biased towards the opcodes that still have holes.
+"""
+
+import random
+from collections import Counter
+
+from cpu_model import ADD, AND, INC, LDB, MNEMONICS, NOPS, OPERANDS, REG_COUNT, SUB
+from func_coverage import CLASSES
+
+DEFAULT_WEIGHTS = {inst: 4 for inst in MNEMONICS}
+DEFAULT_WEIGHTS[LDB] = 8
+DEFAULT_WEIGHTS.update({inst: 1 for inst in NOPS})
+
+# Draws are made in blocks to keep the per-instruction cost low.
+_BLOCK = 1024
+
+
+def parse_weights(spec, base=None):
+    """Update ``base`` weights from a spec such as ``"ADD=8,NOP=0"``.
+
+    Keys are mnemonics, ``NOP`` (all NOP slots) or 4-bit opcodes (``0b0101``).
+    """
+    weights = dict(DEFAULT_WEIGHTS if base is None else base)
+    by_name = {name: (inst,) for inst, name in MNEMONICS.items()}
+    by_name["NOP"] = NOPS
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.partition("=")
+        key = key.strip().upper()
+        insts = by_name[key] if key in by_name else (int(key, 0),)
+        for inst in insts:
+            weights[inst] = float(value)
+    return weights
+
+
+def instruction_stream(seed, weights=None, count=None, out_of_range=0.05):
+    """Yield encoded ``(ui_in, uio_in)`` pairs; endless unless ``count`` is given.
+
+    ``out_of_range`` is the probability that a register field selects 14 or 15.
+    """
+    rng = random.Random(seed)
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    opcodes = [inst for inst in range(16) if weights.get(inst, 0) > 0]
+    op_weights = [weights[inst] for inst in opcodes]
+    in_range = 1.0 - out_of_range
+
+    def reg():
+        if rng.random() < in_range:
+            return rng.randrange(REG_COUNT)
+        return rng.randrange(REG_COUNT, 16)
+
+    emitted = 0
+    while count is None or emitted < count:
+        block = _BLOCK if count is None else min(_BLOCK, count - emitted)
+        for inst in rng.choices(opcodes, op_weights, k=block):
+            if inst == LDB:
+                # uio_in carries the data byte; r2/r3 are not decoded
+                yield inst << 4 | reg(), rng.randrange(256)
+            else:
+                # Unused fields are randomized too, the RTL must ignore them
+                yield inst << 4 | reg(), reg() << 4 | reg()
+        emitted += block
+
+
+_CLASS_OPCODES = {name: (inst,) for inst, name in MNEMONICS.items()}
+_CLASS_OPCODES["NOP"] = NOPS
+
+
+def _instruction(rng, inst, fields=None, data=None):
+    """Encode ``inst``; fields not given in ``fields`` ({field: register}) are random, in range."""
+    regs = [rng.randrange(REG_COUNT) for _ in range(3)]
+    for field, value in (fields or {}).items():
+        regs[field] = value
+    if inst == LDB:
+        return inst << 4 | regs[0], rng.randrange(256) if data is None else data
+    return inst << 4 | regs[0], regs[1] << 4 | regs[2]
+
+
+def _carry_operands(rng, inst, carry):
+    """ALU inputs for which ``inst`` leaves ``processor_stat`` equal to ``carry``."""
+    if inst == ADD:
+        if carry:
+            x = rng.randrange(1, 256)
+            return x, rng.randrange(256 - x, 256)
+        x = rng.randrange(256)
+        return x, rng.randrange(256 - x)
+    if inst == SUB:
+        if carry:
+            x = rng.randrange(255)
+            return x, rng.randrange(x + 1, 256)
+        x = rng.randrange(256)
+        return x, rng.randrange(x + 1)
+    if inst == INC:
+        return (0xFF if carry else rng.randrange(255)), 0
+    return rng.randrange(256), rng.randrange(256)
+
+
+def hole_sequence(rng, group, index):
+    """A few instructions that hit coverage bin ``index`` of ``group`` (see func_coverage)."""
+    def pick(cls):
+        return rng.choice(_CLASS_OPCODES[CLASSES[cls]])
+
+    if group in ("fields", "out_of_range"):
+        cls, field, value = index
+        return [_instruction(rng, pick(cls), {field: value})]
+    first, second = pick(index[0]), pick(index[1])
+    if group == "pairs":
+        return [_instruction(rng, first), _instruction(rng, second)]
+    if group in ("raw", "waw"):
+        reg = rng.randrange(REG_COUNT)
+        if group == "raw":
+            field = rng.choice([f for f in OPERANDS[second][:2] if f is not None])
+        else:
+            field = OPERANDS[second][2]
+        return [_instruction(rng, first, {OPERANDS[first][2]: reg}), _instruction(rng, second, {field: reg})]
+
+    # carry: put processor_stat in the `before` state, load operands, run the op
+    cls, before, after = index
+    inst = pick(cls)
+    if before:
+        reg = rng.randrange(REG_COUNT)
+        program = [_instruction(rng, LDB, {0: reg}, 0xFF), _instruction(rng, INC, {0: reg, 1: reg})]
+    else:
+        program = [_instruction(rng, AND)]
+    in1, in2 = _carry_operands(rng, inst, after)
+    a, b = rng.sample(range(REG_COUNT), 2)
+    rd1, rd2, _ = OPERANDS[inst]
+    fields = {rd1: a} if rd2 is None else {rd1: a, rd2: b}
+    return program + [_instruction(rng, LDB, {0: a}, in1), _instruction(rng, LDB, {0: b}, in2),
+                      _instruction(rng, inst, fields)]
+
+
+def hole_weights(weights, holes, boost=4.0):
+    """``weights`` scaled up for the opcodes involved in the most ``holes``; zero stays zero."""
+    need = Counter()
+    for group, index in holes:
+        need[index[0]] += 1
+        if group in ("pairs", "raw", "waw"):
+            need[index[1]] += 1
+    top = max(need.values(), default=0) or 1
+    return {inst: weight * (1 + boost * need[CLASSES.index(MNEMONICS.get(inst, "NOP"))] / top)
+            for inst, weight in weights.items()}
+
+
+def directed_stream(seed, coverage, weights=None, count=None, directed=0.5, interval=64,
+                    out_of_range=0.05):
+    """Like instruction_stream, but steered by the live holes of ``coverage``.
+
+    ``coverage`` must be sampled with the executed instructions while the
+    stream is consumed (``run_lockstep(..., coverage=coverage)``). Every
+    ``interval`` instructions the holes are re-read; each pick is then, with
+    probability ``directed``, a hole_sequence for one of them, else one
+    random instruction drawn with hole_weights. Once every bin is hit it
+    continues as plain instruction_stream. ``weights`` only shape the
+    random part.
+    """
+    rng = random.Random(seed)
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    emitted = 0
+    while count is None or emitted < count:
+        holes = coverage.holes()
+        if not holes:
+            remaining = None if count is None else count - emitted
+            yield from instruction_stream(rng.getrandbits(32), weights, remaining, out_of_range)
+            return
+        randoms = instruction_stream(rng.getrandbits(32), hole_weights(weights, holes), None, out_of_range)
+        refresh = emitted + interval
+        while emitted < refresh and (count is None or emitted < count):
+            if holes and rng.random() < directed:
+                program = hole_sequence(rng, *holes.pop(rng.randrange(len(holes))))
+            else:
+                program = [next(randoms)]
+            for inst in program[:None if count is None else count - emitted]:
+                yield inst
+                emitted += 1
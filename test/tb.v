@@ -6,10 +6,48 @@
 module tb ();
 
   // Dump the signals to a VCD file. You can view it with gtkwave.
+  // Dumping is controlled from Python (see test/waves.py) through:
+  //   dump_scope  0 = off, 1 = tb ports only, 2 = register file only, 3 = everything
+  //   dump_on     $dumpon / $dumpoff once dumping has started
+  // Without Python control everything is dumped, as before. The scope is
+  // fixed by the first $dumpvars; +dumpfile=<name> sets the output file.
+  reg [1:0] dump_scope = 2'd3;
+  reg dump_on = 1'b1;
+  reg dump_ready = 1'b0;
+  reg dump_started = 1'b0;
+  reg [8*256-1:0] dump_file;
+
+  task start_dump;
+    begin
+      $dumpfile(dump_file);
+      case (dump_scope)
+        2'd1: $dumpvars(1, tb);
+`ifdef GL_TEST
+        2'd2: $dumpvars(1, tb);  // no register file in the netlist
+`else
+        2'd2: $dumpvars(0, tb.myCPU.RF1);
+`endif
+        default: $dumpvars(0, tb);
+      endcase
+      dump_started = 1'b1;
+    end
+  endtask
+
   initial begin
-    $dumpfile("tb.vcd");
-    $dumpvars(0, tb);
+    if (!$value$plusargs("dumpfile=%s", dump_file)) dump_file = "tb.vcd";
     #1;
+    // Python may have configured dumping at time 0
+    dump_ready = 1'b1;
+    if (dump_scope != 0 && dump_on) start_dump;
+  end
+
+  always @(dump_scope or dump_on) begin
+    if (dump_ready) begin
+      if (!dump_started) begin
+        if (dump_scope != 0 && dump_on) start_dump;
+      end else if (dump_on && dump_scope != 0) $dumpon;
+      else $dumpoff;
+    end
   end
 
   // Wire up the inputs and outputs:
@@ -41,4 +79,47 @@ module tb ();
       .rst_n  (rst_n)     // not reset
   );
 
+  // Stimulus memory, used by test/driver.py to run a preloaded program in
+  // native simulator time. Each word is {ui_in, uio_in} for one cycle; the
+  // uo_out sampled after it is written back to resp_mem. Idle unless
+  // stim_run is raised from Python.
+  localparam STIM_DEPTH = 65536;
+
+  reg [15:0] stim_mem [0:STIM_DEPTH-1];
+  reg [7:0] resp_mem [0:STIM_DEPTH-1];
+  reg [8*256-1:0] stim_file;
+  reg [8*256-1:0] resp_file;
+  reg stim_load = 1'b0;   // rising edge reloads stim_mem from stim_file
+  reg stim_run = 1'b0;    // rising edge starts playback from word 0
+  reg stim_done = 1'b0;
+  reg [31:0] stim_len = 0;
+  reg [31:0] stim_pc = 0;
+
+  initial begin
+    if (!$value$plusargs("stim_file=%s", stim_file)) stim_file = "stim.hex";
+    if (!$value$plusargs("resp_file=%s", resp_file)) resp_file = "resp.hex";
+  end
+
+  always @(posedge stim_load) $readmemh(stim_file, stim_mem);
+
+  always @(posedge stim_run) begin
+    stim_pc = 0;
+    stim_done = 1'b0;
+  end
+
+  // Inputs change on the falling edge, so they are stable for the rising edge
+  always @(negedge clk) begin
+    if (stim_run && !stim_done) begin
+      if (stim_pc > 0) resp_mem[stim_pc-1] = uo_out;
+      if (stim_pc == stim_len) begin
+        $writememh(resp_file, resp_mem, 0, stim_len - 1);
+        {ui_in, uio_in} = 16'h4000;  // park on a NOP until Python takes over
+        stim_done = 1'b1;
+      end else begin
+        {ui_in, uio_in} = stim_mem[stim_pc];
+        stim_pc = stim_pc + 1;
+      end
+    end
+  end
+
 endmodule
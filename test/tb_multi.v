@@ -0,0 +1,44 @@
+`default_nettype none `timescale 1ns / 1ps
+
+/* K independent copies of tt_um_8bit_cpu in one simulation (make TESTBENCH=multi).
+   Copy k takes ui_in/uio_in from bits [8k+7:8k] of the wide input buses and
+   drives the same bits of uo_out, so multi_instance.py drives K programs
+   with one write per bus and checks all K outputs with one read per cycle.
+   K is set with make MULTI_K=<K>. Nothing is dumped: debug a failing copy
+   by replaying its program in tb.v.
+*/
+module tb_multi #(
+    parameter K = 64
+) ();
+
+  reg clk;
+  reg rst_n;
+  reg ena;
+  reg [8*K-1:0] ui_in;
+  reg [8*K-1:0] uio_in;
+  wire [8*K-1:0] uo_out;
+
+  genvar k;
+  generate
+    for (k = 0; k < K; k = k + 1) begin : copy
+      wire [7:0] uio_out;
+      wire [7:0] uio_oe;
+
+      tt_um_8bit_cpu myCPU (
+`ifdef GL_TEST
+          .VPWR(1'b1),
+          .VGND(1'b0),
+`endif
+          .ui_in  (ui_in[8*k+:8]),
+          .uo_out (uo_out[8*k+:8]),
+          .uio_in (uio_in[8*k+:8]),
+          .uio_out(uio_out),
+          .uio_oe (uio_oe),
+          .ena    (ena),
+          .clk    (clk),
+          .rst_n  (rst_n)
+      );
+    end
+  endgenerate
+
+endmodule
@@ -0,0 +1,150 @@
+"""Unit tests for the pure-Python tools; they need no simulator.
+
+Run with ``python -m pytest test_tools.py``.
+"""
+
+import io
+
+import numpy as np
+import pytest
+
+import shrink
+from assembler import AssemblerError, assemble, assemble_line, disassemble, pairs
+from build_cache import cache_key
+from cpu_model import NOPS, CPUModel
+from cycle_trace import TraceWriter, open_trace
+from func_coverage import GOAL_BINS, Coverage, merge_files
+from stimulus import instruction_stream
+
+
+def _sampled(seed, count):
+    coverage = Coverage()
+    model = CPUModel()
+    for ui_in, uio_in in instruction_stream(seed, None, count):
+        model.step(ui_in, uio_in)
+        coverage.sample(ui_in, uio_in, model.processor_stat)
+    return coverage
+
+
+def test_disassemble_assemble_roundtrip():
+    # Every instruction with its unused fields cleared reassembles to the same bytes
+    for ui_in in range(256):
+        for uio_in in range(256):
+            text = disassemble(ui_in, uio_in)
+            encoded = assemble_line(text)
+            assert disassemble(*encoded) == text
+            assert assemble_line(disassemble(*encoded)) == encoded
+
+
+def test_assemble_disassemble_identity():
+    source = "LDB r1, 0x12\nLDB r2, 0x34\nADD r3, r1, r2\nORA r1, r2, r4\nSTB r3\nRDS\nNOP\nNOP 0b1111"
+    assert [disassemble(*inst) for inst in pairs(assemble(source))] == source.splitlines()
+    assert assemble_line("NOP 0b1111") == (NOPS[-1] << 4, 0)
+
+
+def test_tabs_and_comments():
+    assert assemble_line("ADD\tr3,\tr1, r2") == assemble_line("ADD r3, r1, r2")
+    assert assemble_line("\tstb\tr7\t; out") == assemble_line("STB r7")
+    assert assemble_line("RDS\t") == assemble_line("RDS")
+    assert assemble_line("  # nothing") is None
+
+
+def test_assembler_errors():
+    for line in ("FOO r1", "ADD r1, r2", "LDB r1, 0x100", "STB r16", ".byte 1"):
+        with pytest.raises(AssemblerError):
+            assemble_line(line)
+
+
+def test_coverage_merge_sums_counts(tmp_path):
+    a, b = _sampled(1, 500), _sampled(2, 700)
+    expected = a.counts + b.counts
+    a.save(tmp_path / "a.npz")
+    b.save(tmp_path / "b.npz")
+    assert np.array_equal(merge_files([tmp_path / "a.npz", tmp_path / "b.npz"]).counts, expected)
+    assert np.array_equal(Coverage(a.counts.copy()).merge(b).counts, expected)
+    assert 0 < a.hits() <= GOAL_BINS
+
+
+def test_goal_bins():
+    assert GOAL_BINS == 694
+    summary = Coverage().summary()
+    assert summary["total"] == {"hit": 0, "bins": GOAL_BINS, "percent": 0.0}
+    assert sum(group["bins"] for name, group in summary.items() if name != "total") == GOAL_BINS
+    assert len(Coverage().holes()) == GOAL_BINS
+
+
+def _shrunk(program):
+    indices, inputs, expected = shrink.backward_slice(program)
+    sliced = [program[i] if expected is None else shrink.known_reads(*program[i]) for i in indices]
+    inputs = {position: inputs[i] for position, i in enumerate(indices)}
+    kept = shrink.ddmin(sliced, inputs, expected, jobs=1)
+    return sliced, kept
+
+
+def test_ddmin_toy_program():
+    program = list(pairs(assemble("""
+        LDB r1, 0x05
+        LDB r2, 0x07
+        LDB r5, 0x01
+        ADD r3, r1, r2
+        NOT r5, r4
+        STB r4
+        STB r3
+    """)))
+    sliced, kept = _shrunk(program)
+    assert [disassemble(*sliced[i]) for i in kept] == ["LDB r1, 0x05", "LDB r2, 0x07", "ADD r3, r1, r2", "STB r3"]
+
+
+@pytest.mark.parametrize("seed", [1, 20])
+def test_ddmin_is_one_minimal(seed):
+    program = list(instruction_stream(seed, None, 300))
+    outputs = CPUModel().run(program)
+    cycle = max(i for i, out in enumerate(outputs) if out is not None)
+    sliced, kept = _shrunk(program[:cycle + 1])
+    assert kept[-1] == len(sliced) - 1
+    assert shrink._interesting(kept)
+    for i in range(len(kept) - 1):
+        assert not shrink._interesting(kept[:i] + kept[i + 1:])
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_shrink_reads_no_x(seed):
+    # r14 and r15 read X, and the random stream picks them for some of its operands
+    program = list(instruction_stream(seed, None, 400))
+    outputs = CPUModel().run(program)
+    for cycle in range(100, 400, 50):
+        if outputs[cycle] is None:
+            continue
+        shrunk = shrink.shrink(program[:cycle + 1], jobs=1, log=io.StringIO())
+        assert not any(shrink.reads_x(*inst) for inst in shrunk)
+        assert CPUModel().run(shrunk)[-1] == outputs[cycle]
+
+
+def test_trace_roundtrip(tmp_path):
+    rng = np.random.default_rng(0)
+    ui_in, uio_in, uo_out, stat = rng.integers(0, 256, (4, 1000)).tolist()
+    uo_out[10] = stat[20] = None
+    digests = rng.integers(0, 1 << 32, 1000).tolist()
+    with TraceWriter(str(tmp_path), digest=True, chunk=300, meta={"seed": 7}) as writer:
+        for row in zip(ui_in, uio_in, uo_out, stat, digests):
+            writer.record(*row)
+
+    trace = open_trace(str(tmp_path))
+    assert len(trace) == 1000 and trace.meta["seed"] == 7
+    assert trace.ui_in.tolist() == ui_in and trace.uio_in.tolist() == uio_in
+    assert trace.rf_digest.tolist() == digests
+    assert [v if k else None for v, k in zip(trace.uo_out.tolist(), trace.uo_known)] == uo_out
+    assert [v if k else None for v, k in zip(trace.processor_stat.tolist(), trace.stat_known)] == stat
+
+
+def test_build_cache_key(tmp_path):
+    source = tmp_path / "top.v"
+    source.write_text("module top; endmodule\n")
+    config = {"VERILOG_SOURCES": str(source), "COMPILE_ARGS": "-g2012 -f /tmp/a/cmds.f", "TOPLEVEL": "tb"}
+    key = cache_key(config)
+    # The cmds.f path names the build directory itself and must not change the key
+    assert cache_key({**config, "COMPILE_ARGS": "-g2012 -f /tmp/b/cmds.f"}) == key
+    assert cache_key({**config, "TOPLEVEL": "tb_multi"}) != key
+    assert cache_key({**config, "COMPILE_ARGS": "-g2012 -DGL_TEST -f /tmp/a/cmds.f"}) != key
+    source.write_text("module top; wire w; endmodule\n")
+    assert cache_key(config) != key
@@ -0,0 +1,123 @@
+"""Per-test waveform control for the ``tb`` testbench.
+
+tb.v dumps everything by default, which is far too much for long random
+runs. ``configure`` selects a mode for one test, without editing tb.v, and
+restores the previous one when the test ends:
+
+* ``off``: no dumping,
+* ``ports``, ``rf``, ``full``: dump the tb ports, the register file, or everything,
+* ``window``: dump nothing while the test runs; on a failure, reset the
+  design, restore the state of ``WINDOW`` cycles before the failure and
+  replay just those cycles with dumping on.
+
+``DUMP`` and ``DUMP_WINDOW`` pick the mode and window length from the
+environment. Compressed output comes from ``make WAVE_FORMAT=fst`` or
+from gzipping a finished VCD with ``compress_vcd``.
+"""
+
+import gzip
+import os
+import shutil
+from collections import deque
+from contextlib import contextmanager
+
+import cocotb
+
+from cpu_model import CPUModel
+from harness import apply_reset, run_lockstep
+
+SCOPES = {"off": 0, "ports": 1, "rf": 2, "full": 3}
+MODES = (*SCOPES, "window")
+
+
+class Waves:
+    """Thin wrapper over the dump_scope/dump_on controls in tb.v."""
+
+    def __init__(self, dut):
+        self._scope = dut.dump_scope
+        self._on = dut.dump_on
+
+    def start(self, scope="full"):
+        """Start (or resume) dumping. The scope only applies if nothing was dumped yet."""
+        self._scope.value = SCOPES[scope]
+        self._on.value = 1
+
+    def stop(self):
+        self._on.value = 0
+
+    def save(self):
+        return int(self._scope.value), int(self._on.value)
+
+    def restore(self, saved):
+        self._scope.value, self._on.value = saved
+
+
+class WaveWindow:
+    """Keeps the last ``cycles`` instructions and the model state from before them.
+
+    Pass it to run_lockstep as ``window``; on a mismatch, run_lockstep calls
+    ``replay`` to dump just the failing window.
+    """
+
+    def __init__(self, waves, cycles=64, scope="full", model=None):
+        self.waves = waves
+        self.cycles = cycles
+        self.scope = scope
+        self._recent = deque()
+        # State at the start of the window: a second model running `cycles` behind
+        self._start = CPUModel() if model is None else model.copy()
+
+    def record(self, ui_in, uio_in):
+        recent = self._recent
+        recent.append((ui_in, uio_in))
+        if len(recent) > self.cycles:
+            self._start.step(*recent.popleft())
+
+    async def replay(self, dut):
+        """Reset, restore the window's starting state and rerun the window with dumping on."""
+        cocotb.log.info(f"Replaying the last {len(self._recent)} cycles with waveform dumping")
+        await apply_reset(dut)
+        await run_lockstep(dut, self._start.restore_program())
+        self.waves.start(self.scope)
+        try:
+            await run_lockstep(dut, list(self._recent), self._start.copy())
+        except AssertionError:
+            pass  # the failure being captured
+        finally:
+            self.waves.stop()
+
+
+@contextmanager
+def configure(dut, mode=None, window=None, scope=None):
+    """Apply waveform ``mode`` inside a ``with`` block; yields a WaveWindow in window mode, else None.
+
+    The dump controls are put back as they were on exit, so one test's
+    mode does not carry over to the tests after it.
+    """
+    mode = mode or os.getenv("DUMP", "full")
+    if mode not in MODES:
+        raise ValueError(f"DUMP must be one of {', '.join(MODES)}, not {mode!r}")
+    waves = Waves(dut)
+    saved = waves.save()
+    try:
+        if mode == "window":
+            waves.stop()
+            cycles = int(window or os.getenv("DUMP_WINDOW", "64"))
+            yield WaveWindow(waves, cycles, scope or os.getenv("DUMP_SCOPE", "full"))
+        else:
+            if mode == "off":
+                waves.stop()
+            else:
+                waves.start(mode)
+            yield None
+    finally:
+        waves.restore(saved)
+
+
+def compress_vcd(path):
+    """Gzip a finished VCD next to itself and remove the original; returns the new path."""
+    target = path + ".gz"
+    with open(path, "rb") as src, gzip.open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+    return target